@@ -5,40 +5,38 @@ import re
 import datetime
 import time
 import logging
-import threading as th
 import argparse as arg
 
 from driver.gencounter import *
 from driver.ks53230 import KS53230
 from misc.measured_data import MeasuredData
 
-def guardaPorSi(datos, fichero):
-    datos.flushToFile(fichero)
-    # Me echo una siesta...
-
 def main():
     '''
     A quick tool to measure time interval with the Keysight 53230A
     '''
 
-    inst = KS53230("192.168.0.6")
+    inst = KS53230(Interfaces.vxi11, "192.168.0.6", logging.getLogger("KS53230"))
     
     #Vector de parámetros
     cfgstr = "trig1:1.5 trig2:1.5 ch1:1 ch2:2 sampl:10 ref:A coup:dc imp:1000000"
     
-    #Reseteamos el dispositivo
-    inst.resetDevice()
+    #Reseteamos el dispositivo, o recuperamos la configuración guardada.
+    #La configuración de la medida (timeInterval) se aplica con la caché,
+    #así que solo se envía lo que cambie
+    inst.warmStart("ks53230_setup.json", lambda: inst.configureTimeInterval(cfgstr),
+                   key=cfgstr)
     
     #Definimos datos
     datos = MeasuredData()
     
-    #Medimos y guardamos
-    t_meas = th.Thread(target=inst.timeInterval, args=(cfgstr, datos))
-    t_data = th.Thread(target=guardaPorSi, args=(datos, "salida.dat"))
-    
-    t_meas.start()
-    time.sleep(60) # no hay que ser ansias
-    t_data.start()
+    #Medimos y guardamos. Las medidas se van guardando en el fichero
+    #mientras se mide (también si se para con Ctrl+C)
+    datos.startFlusher("salida.dat")
+    try:
+        inst.timeInterval(cfgstr, datos)
+    finally:
+        datos.stopFlusher()
     
 if __name__ == "__main__" :
     main()
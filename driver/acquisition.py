@@ -0,0 +1,195 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Synchronized measurements with several counters.
+
+Acquisition drives N counters (GenCounter) from a single event loop (see
+the asyncio API of GenCounter):
+ 1. All the counters are configured at the same time.
+ 2. When all of them are ready, they are armed together just after a
+    second boundary of the host clock, so every counter takes its first
+    sample on the same trigger (the PPS). The host must be synchronized
+    with the PPS (i.e. NTP), at least within the arming margin.
+ 3. The samples of each counter go to its own MeasuredData (which can be
+    flushed to a file as usual) and to an EpochStore, where the samples
+    of each epoch from all the counters form a row.
+
+Usage:
+    acq = Acquisition(period=1)
+    acq.add("fca", FCA3103(Interfaces.usb, 2), "ref:A sampl:-1 tstamp:Y",
+            timebase="seconds")
+    acq.add("ks", KS53230(Interfaces.socket, "192.168.0.6", logger),
+            "ref:A sampl:-1 tstamp:Y coup:dc imp:50", timebase="hhmmss")
+    acq.run(duration=3600)
+    rows = acq.store.takeRows()
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup measurement
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import math
+import time
+import asyncio
+import logging
+
+# User modules
+from driver.gencounter import runSync
+from misc.measured_data import MeasuredData
+from misc.epoch_store import EpochStore
+
+class Acquisition() :
+    '''
+    Measure time intervals with several counters armed for the same trigger.
+    '''
+
+    ## Time (s) after the second boundary of the host clock to arm the counters
+    arm_margin = 0.2
+
+    def __init__(self, period=1.0) :
+        '''
+        Constructor
+
+        Args:
+            period (float) : Period (s) of the trigger, i.e. 1 for a PPS
+        '''
+        ## Samples of all the counters by epoch (EpochStore)
+        self.store = EpochStore(period)
+        ## Counters: [(name, counter, cfg, MeasuredData)]
+        self.devices = []
+        self._configured = 0
+        self._allConfigured = None
+        self._go = None
+
+    def add(self, name, counter, cfgstr, timebase="seconds", meas_out=None) :
+        '''
+        Method to add a counter to the measurement
+
+        Args:
+            name (str) : Name of the counter (column of the store)
+            counter (GenCounter) : An open counter
+            cfgstr (str or TimeIntervalConfig) : Configuration of the
+                                                 measurement (see timeInterval)
+            timebase (str) : Time base of the timestamps of the counter, see
+                             misc.epoch_store.TIMEBASES
+            meas_out (MeasuredData) : Container for the samples of this
+                                      counter, a new one if None
+
+        Returns:
+            The container of the counter (MeasuredData).
+        '''
+        if meas_out is None :
+            meas_out = MeasuredData()
+        meas_out.addListener(self.store.column(name, timebase))
+        self.devices.append((name, counter, cfgstr, meas_out))
+        return meas_out
+
+    def data(self, name) :
+        '''
+        The container of a counter (MeasuredData)
+        '''
+        for n, counter, cfg, meas_out in self.devices :
+            if n == name :
+                return meas_out
+        raise KeyError(name)
+
+    async def _ready(self) :
+        '''
+        Awaited by each counter when it's configured, it returns when all
+        of them must be armed
+        '''
+        self._configured += 1
+        if self._configured == len(self.devices) :
+            self._allConfigured.set()
+        await self._go.wait()
+
+    async def _arm(self) :
+        '''
+        Arm all the counters after the next second boundary
+        '''
+        await self._allConfigured.wait()
+        now = time.time()
+        # The first trigger is the next PPS after arming
+        boundary = math.floor(now) + 1
+        if now - math.floor(now) < self.arm_margin :
+            boundary -= 1
+        await asyncio.sleep(max(0, boundary + self.arm_margin - time.time()))
+        self.store.arm(boundary + 1)
+        logging.debug("Counters armed for the trigger at %s"
+                      % time.strftime("%H:%M:%S", time.localtime(boundary + 1)))
+        self._go.set()
+
+    async def runAsync(self, duration=None) :
+        '''
+        Coroutine to configure, arm and read all the counters
+
+        Args:
+            duration (float) : Stop the measurement after this time (s),
+                               None to wait until all the counters take
+                               their samples
+
+        When the duration ends, the measurement of each counter is cancelled:
+        the counter is stopped and its pending answers discarded, so the
+        acquisition can be run again (a new run starts new rows, the ones
+        not taken yet are dropped).
+
+        Returns:
+            The rows not taken yet (see EpochStore.takeRows), all the rows
+            are completed at the end.
+        '''
+        if not self.devices :
+            raise RuntimeError("No counters in the acquisition")
+        self.store.reset()
+        self._configured = 0
+        self._allConfigured = asyncio.Event()
+        self._go = asyncio.Event()
+        for name, counter, cfg, meas_out in self.devices :
+            logging.info("%s: %s" % (name, counter.open()))
+
+        tasks = [asyncio.ensure_future(counter.timeIntervalAsync(cfg, meas_out, self._ready))
+                 for name, counter, cfg, meas_out in self.devices]
+        tasks.append(asyncio.ensure_future(self._arm()))
+        try :
+            done, pending = await asyncio.wait(tasks, timeout=duration,
+                                               return_when=asyncio.FIRST_EXCEPTION)
+            for t in done :
+                # Raise the error of a counter
+                t.result()
+        finally :
+            for t in tasks :
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return self.store.flush()
+
+    def run(self, duration=None) :
+        '''
+        Blocking version of runAsync
+        '''
+        return runSync(self.runAsync(duration))
+
+    def close(self) :
+        '''
+        Method to close all the counters
+        '''
+        for name, counter, cfg, meas_out in self.devices :
+            counter.close()
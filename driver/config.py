@@ -0,0 +1,256 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Typed configuration of the measurements.
+
+The methods of GenCounter take a configuration string with the syntax
+<token>:<value> [<token>:<value>]. The classes in this module are the
+parsed and validated form of those strings: each string is parsed once
+(the results are cached) and the measurement methods accept either the
+string or the config object, so repeated measurements skip the parsing.
+
+Usage:
+    cfg = TimeIntervalConfig.parse("ref:A sampl:1000 tstamp:Y trig1:1.5 trig2:1.5")
+    for i in range(100) :
+        counter.timeInterval(cfg, datos)
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup measurement
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import functools
+from dataclasses import dataclass, field
+
+@functools.lru_cache(maxsize=256)
+def tokenize(cfgstr) :
+    '''
+    Split a configuration string in (token, value) pairs
+
+    Args:
+        cfgstr (str) : A string containing a configuration chain
+
+    Returns:
+        A tuple of (token, value) tuples.
+
+    Raises:
+        AttributeError when an item hasn't the <token>:<value> syntax.
+    '''
+    pairs = []
+    for s in cfgstr.split() :
+        key, sep, val = s.partition(":")
+        if sep == "" or key == "" :
+            raise AttributeError("Bad item in the configuration string (%s)" % s)
+        pairs.append((key, val))
+    return tuple(pairs)
+
+@functools.lru_cache(maxsize=256)
+def _parse(cls, cfgstr) :
+    return cls.fromDict(dict(tokenize(cfgstr)))
+
+class MeasConfig() :
+    '''
+    Common methods of the configuration classes
+    '''
+
+    @classmethod
+    def parse(cls, cfg) :
+        '''
+        Get the config object for a configuration string
+
+        Args:
+            cfg (str or MeasConfig) : A configuration string, or an object
+                                      of this class (returned as is)
+
+        Returns:
+            An object of this class.
+
+        Raises:
+            AttributeError when an invalid value was passed.
+        '''
+        if isinstance(cfg, cls) :
+            return cfg
+        if cfg is None :
+            raise AttributeError("Empty configuration passed to %s" % cls.__name__)
+        return _parse(cls, cfg)
+
+def _choice(name, value, valid) :
+    '''
+    Check that a value is in a list of valid ones
+    '''
+    if value not in valid :
+        raise AttributeError("%s not valid (%s)" % (name, value))
+    return value
+
+@dataclass(frozen=True)
+class ChannelLevel(MeasConfig) :
+    '''
+    Trigger level of an input channel: a voltage or auto mode at a percentage
+    '''
+    ch : int
+    volts : float = None
+    auto : int = None
+
+@dataclass(frozen=True)
+class TrigLevelConfig(MeasConfig) :
+    '''
+    Trigger levels of the input channels (trig<ch>:<value>)
+
+    The value is a voltage (in V) or the key "a" followed by a percentage,
+    i.e. a50 for mode auto at 50% of the amplitude of the signal.
+    '''
+    levels : tuple = ()
+
+    @classmethod
+    def fromDict(cls, cfgdict) :
+        levels = []
+        for key, val in cfgdict.items() :
+            if len(key) != 5 or not key.startswith("trig") or not key[4].isdigit() :
+                continue
+            ch = int(key[4])
+            try :
+                if val[:1] == "a" :
+                    levels.append(ChannelLevel(ch, auto=int(val[1:] or 50)))
+                else :
+                    levels.append(ChannelLevel(ch, volts=float(val)))
+            except ValueError :
+                raise AttributeError("Trigger level not valid (%s)" % val)
+        return cls(tuple(levels))
+
+@dataclass(frozen=True)
+class TriggerConfig(MeasConfig) :
+    '''
+    Common settings of the trigger system (cnt, del, slo, sou)
+    '''
+    count : int = None
+    delay : float = None
+    slope : str = None
+    source : str = None
+
+    def __post_init__(self) :
+        if self.count is not None and (self.count < 1 or self.count > 1000000) :
+            raise AttributeError("Trigger Count out of limits (%d)" % self.count)
+        if self.delay is not None and (self.delay < 0 or self.delay > 3600) :
+            raise AttributeError("Trigger delay out of limits (%s)" % self.delay)
+        if self.source is not None :
+            _choice("Trigger source", self.source, ("imm", "bus", "ext"))
+        if self.slope is not None :
+            _choice("Trigger slope", self.slope, ("pos", "neg"))
+
+    @classmethod
+    def fromDict(cls, cfgdict) :
+        try :
+            return cls(count=int(cfgdict["cnt"]) if "cnt" in cfgdict else None,
+                       delay=float(cfgdict["del"]) if "del" in cfgdict else None,
+                       slope=cfgdict.get("slo"),
+                       source=cfgdict.get("sou"))
+        except ValueError as e :
+            raise AttributeError("Bad trigger configuration: %s" % e)
+
+@dataclass(frozen=True)
+class TimeIntervalConfig(MeasConfig) :
+    '''
+    Settings of a time interval measurement
+
+    Tokens: ref:{A,B} sampl:<int> (-1 for infinite mode) <tstamp>:{Y,N}
+    <arr>:<int> <coup>:{ac,dc} <imp>:<ohms> <trig<ch>>:<value>
+    '''
+    ref_chan : int = 1
+    other_chan : int = 2
+    samples : int = 1
+    tstamp : bool = False
+    block : int = 0
+    coupling : str = None
+    impedance : float = None
+    levels : TrigLevelConfig = field(default_factory=TrigLevelConfig)
+
+    def __post_init__(self) :
+        if self.samples == 0 or self.samples < -1 :
+            raise AttributeError("Samples number not valid (%d)" % self.samples)
+        if self.block < 0 :
+            raise AttributeError("Array size not valid (%d)" % self.block)
+        if self.coupling is not None :
+            _choice("Coupling", self.coupling, ("ac", "dc"))
+
+    @classmethod
+    def fromDict(cls, cfgdict) :
+        ref = _choice("Reference channel", cfgdict.get("ref", "A"), ("A", "B"))
+        tstamp = _choice("Time stamp", cfgdict.get("tstamp", "N"), ("Y", "N"))
+        try :
+            return cls(ref_chan=1 if ref == "A" else 2,
+                       other_chan=2 if ref == "A" else 1,
+                       samples=int(cfgdict.get("sampl", 1)),
+                       tstamp=tstamp == "Y",
+                       block=int(cfgdict.get("arr", 0)),
+                       coupling=cfgdict["coup"].lower() if "coup" in cfgdict else None,
+                       impedance=float(cfgdict["imp"]) if "imp" in cfgdict else None,
+                       levels=TrigLevelConfig.fromDict(cfgdict))
+        except ValueError as e :
+            raise AttributeError("Bad time interval configuration: %s" % e)
+
+@dataclass(frozen=True)
+class FreqConfig(MeasConfig) :
+    '''
+    Settings of a frequency measurement
+
+    Tokens: ch:<int> cou:{ac,dc} <exp>:<Hz> <res>:<digits> <sampl>:<int>
+    '''
+    ch : int = 1
+    coupling : str = "dc"
+    expected : str = None
+    resolution : int = None
+    samples : int = 1
+
+    def __post_init__(self) :
+        _choice("Coupling", self.coupling, ("ac", "dc"))
+        if self.resolution is not None and (self.resolution < 5 or self.resolution > 15) :
+            raise AttributeError("Resolution out of limits (%d)" % self.resolution)
+        if self.samples < 1 :
+            raise AttributeError("Samples number not valid (%d)" % self.samples)
+
+    @classmethod
+    def fromDict(cls, cfgdict) :
+        try :
+            return cls(ch=int(cfgdict.get("ch", 1)),
+                       coupling=cfgdict.get("cou", "dc").lower(),
+                       expected=cfgdict.get("exp") or None,
+                       resolution=int(cfgdict["res"]) if cfgdict.get("res") else None,
+                       samples=int(cfgdict["sampl"]) if cfgdict.get("sampl") else 1)
+        except ValueError as e :
+            raise AttributeError("Bad frequency configuration: %s" % e)
+
+@dataclass(frozen=True)
+class PeriodConfig(MeasConfig) :
+    '''
+    Settings of a period measurement
+
+    Tokens: ch<n>:<n> for each channel, <trig<ch>>:<value>
+    '''
+    channels : tuple = ()
+    levels : TrigLevelConfig = field(default_factory=TrigLevelConfig)
+
+    @classmethod
+    def fromDict(cls, cfgdict) :
+        chans = tuple(int(k[2:]) for k in cfgdict
+                      if k.startswith("ch") and k[2:].isdigit())
+        return cls(chans, TrigLevelConfig.fromDict(cfgdict))
@@ -28,13 +28,15 @@ Class that implements the interface GenCounter for the Tektronix FCA3103.
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
 # Import system modules
-import re
-import time
+import asyncio
 import logging
+import numpy as np
 
 # User modules
 from driver.gencounter import GenCounter, Interfaces
+from driver.transport import openTransport
 from driver.fca3103_drv  import FCA3103_drv
+from driver.config import TrigLevelConfig, TimeIntervalConfig
 
 # This attribute permits dynamic loading inside wrcalibration class.
 __meas_instr__ = "FCA3103"
@@ -56,8 +58,10 @@ class FCA3103(GenCounter) :
     error = 500000
     ## Keep the trigger values (in Volts)
     trig_rawcfg = None
+    ## Time (s) between polls of the measurement status in array mode
+    poll_time = 0.5
 
-    def __init__(self, interface, port, name=None) :
+    def __init__(self, interface, port, name=None, serial=None) :
         '''
         Constructor
 
@@ -65,14 +69,16 @@ class FCA3103(GenCounter) :
             interface (Interfaces) : The interface used to communicate with the device
             port (str) : The port used (serial port, IP, ...)
             name (str) : An identifier for the device
+            serial (dict) : Settings of the serial port for Interfaces.usb_acm
+                            (Gen_serial args: baudrate, flow)
         '''
         self._conn = interface
         self._port = port
 
-        if self._conn != Interfaces.usb :
+        if self._conn not in (Interfaces.usb, Interfaces.usb_acm) :
             raise Exception("Bad interface")
 
-        self._drv = FCA3103_drv(port)
+        self._drv = FCA3103_drv(port, transport=openTransport(interface, port, **(serial or {})))
 
     def open(self) :
         '''
@@ -84,6 +90,12 @@ class FCA3103(GenCounter) :
         # TODO: Check what is returned when no connection is up
         return info
 
+    def close(self) :
+        '''
+        Method to close the connection with the device
+        '''
+        self._drv.close()
+
     def resetDevice(self) :
         '''
         Method to reset the device
@@ -99,71 +111,158 @@ class FCA3103(GenCounter) :
         Method to set the trigger level for a channel
 
         Args:
-            cfgstr (str) : A string containing valid params
+            cfgstr (str or TrigLevelConfig) : A string containing valid params
 
         The expected params in this method are:
             trig<ch>:<float>, (trig1:0.08, the values are in Volts)
         '''
-        self.trig_rawcfg = cfgstr
-        cfgdict = self.parseConfig(cfgstr)
-        logging.debug("Config parsed: %s" % (str(cfgdict)))
-        keys = " ".join(cfgdict.keys())
-        keys = re.findall(r"(trig\d)", keys)
-        if keys == [] :
+        cfg = TrigLevelConfig.parse(cfgstr)
+        logging.debug("Config parsed: %s" % (str(cfg)))
+        if cfg.levels == () :
             raise Exception("No valid params passed to trigLevel")
-        #logging.debug("Setting config tags: %s" % (str(keys)))
+        self.trig_rawcfg = cfg
 
-        for k in keys :
-            self._drv.write("INPUT%d:LEVEL:AUTO OFF" % int(k[-1]))
-            self._drv.write("INPUT%d:LEVEL %1.3f" % (int(k[-1]), float(cfgdict[k])) )
-            logging.debug("Setting Trigger Level in channel %d to %1.3f"
-                          % (int(k[-1]), float(cfgdict[k])) )
+        with self._drv.batch() :
+            for lvl in cfg.levels :
+                if lvl.volts is None :
+                    raise Exception("Auto trigger level is not supported")
+                self._drv.write("INPUT%d:LEVEL:AUTO OFF" % lvl.ch)
+                self._drv.write("INPUT%d:LEVEL %1.3f" % (lvl.ch, lvl.volts))
+                logging.debug("Setting Trigger Level in channel %d to %1.3f"
+                              % (lvl.ch, lvl.volts))
 
-    def timeInterval(self, cfgstr, meas_out) :
+    async def timeIntervalAsync(self, cfgstr, meas_out, start=None) :
         '''
-        Method to measure Time Interval between the input channels
+        Coroutine to measure Time Interval between the input channels
+
+        By default, the samples are taken one by one with READ?. In array
+        mode, the counter takes blocks of measurements into its internal
+        memory at its native rate and each block is fetched in one transfer.
 
         Args:
-            cfgstr (str) : A string containing valid params
+            cfgstr (str or TimeIntervalConfig) : A string containing valid params
             meas_out (MeasuredData) : The container for the measured data
+            start (coroutine function) : Awaited before arming the device
 
         The expected params in this method are:
             ref:{A,B} The reference channel
-            sampl:<int> The number of samples to be taken
+            sampl:<int> The number of samples to be taken (-1 for infinite mode)
             tstamp:{Y,N} Enable/Disable timestamping
+            <arr>:<int> Enable the array mode with blocks of the given size
         '''
-        cfgdict = self.parseConfig(cfgstr)
-        logging.debug("Config parsed: %s" % (str(cfgdict)))
-        # Repasar la configuración parseada
-        ref_chan, other_chan = (1,2) if cfgdict["ref"] == "A" else (2,1)
-        samples = int(cfgdict["sampl"])
-        tstamp = "ON" if cfgdict["tstamp"] == "Y" else "OFF"
+        cfg = TimeIntervalConfig.parse(cfgstr)
+        logging.debug("Config parsed: %s" % (str(cfg)))
+        ref_chan, other_chan = cfg.ref_chan, cfg.other_chan
+        samples = cfg.samples
+        tstamp = "ON" if cfg.tstamp else "OFF"
+        block = cfg.block
+        # Drop the outliers before storing the samples (if enabled)
+        meas_out = self.filterOutput(meas_out)
 
         # Measurement configuration --------------------------------------------
-        # Trigger mode not continuous
-        self._drv.write("INIT:CONT OFF")
-        # Specify the type of measurement to be done
-        self._drv.write("CONFIGURE:TINTERVAL (@%d),(@%d)" % (ref_chan,
-                        other_chan))
-        # The last command overwrites trigger configuration :-(
-        self.trigLevel(self.trig_rawcfg)
-        # It seems that specify the number of samples here doesn't work properly
-        self._drv.write("TRIG:COUNT 1;:ARM:COUNT 1")
-        # Do you want time stamps?
-        self._drv.write("FORMAT ASCII;:FORMAT:TINF %s" % (tstamp))
+        # All the settings are sent in one or two messages
+        async with self._drv.batch() :
+            # Specify the type of measurement to be done
+            if block > 0 :
+                self._drv.write("CONFIGURE:ARRAY:TINTERVAL (%d),(@%d),(@%d)"
+                                % (block, ref_chan, other_chan))
+            else :
+                self._drv.write("CONFIGURE:TINTERVAL (@%d),(@%d)" % (ref_chan,
+                                other_chan))
+            # Trigger mode not continuous
+            self._drv.write("INIT:CONT OFF")
+            # The last command overwrites trigger configuration :-(
+            self.trigLevel(cfg.levels if cfg.levels.levels else self.trig_rawcfg)
+            if block > 0 :
+                # One arming, "block" measurements
+                self._drv.write("ARM:COUNT 1")
+                self._drv.write("TRIG:COUNT %d" % block)
+            else :
+                # It seems that specify the number of samples here doesn't work properly
+                self._drv.write("TRIG:COUNT 1")
+                self._drv.write("ARM:COUNT 1")
+            # Do you want time stamps?
+            self._drv.write("FORMAT ASCII")
+            self._drv.write("FORMAT:TINF %s" % (tstamp))
 
         # Taking measures from the instrument ----------------------------------
-        ret =  []
-        self._drv.write("INIT")
+        if start is not None :
+            await start()
+        if block > 0 :
+            await self._arrayTimeIntervalAsync(samples, block, tstamp == "ON", meas_out)
+            return
+
+        async with self._measuring() :
+            # Don't wait for completion, INIT ends with the first measure
+            await self._drv.writeAsync("INIT", wait=False)
+
+            k = 0
+            while samples < 0 or k < samples:
+                # Enable the trigger for a new measure, and wait until a PPS pulse
+                # arrives at ref channel. No timeout need by the control software.
+                cur = await self._drv.queryAsync("READ?")
+                if tstamp == "ON":
+                    val, ts = cur.split(',')
+                    meas_out.addMeasures(float(val), float(ts))
+                else: 
+                    meas_out.addMeasures(float(cur))
+                k += 1
+
+    @staticmethod
+    def _parseArray(view) :
+        '''
+        Method to parse an ASCII array answer
+
+        Args:
+            view (memoryview) : The answer, without terminator (see queryRaw)
+
+        Returns:
+            The values (numpy array of floats), empty for a blank answer.
+        '''
+        data = bytes(view)
+        if not data.strip() :
+            return np.empty(0)
+        # A single call converts all the values
+        return np.array(data.split(b","), dtype=float)
+
+    async def _arrayTimeIntervalAsync(self, samples, block, tstamp, meas_out) :
+        '''
+        Method to take time interval measurements in blocks
 
+        The instrument must be configured for array measurements of "block"
+        samples. Each block is started with INIT, the status is polled until
+        the block is completed and then all the values are fetched at once.
+
+        Args:
+            samples (int) : The number of samples to be taken (-1 for infinite mode)
+            block (int) : Number of samples in each block
+            tstamp (boolean) : Each value comes with its timestamp
+            meas_out (MeasuredData) : The container for the measured data
+        '''
+        # Bytes for each value in ASCII format (+ timestamp)
+        width = 48 if tstamp else 24
+        cur_block = block
         k = 0
-        while k < samples:
-            # Enable the trigger for a new measure, and wait until a PPS pulse
-            # arrives at ref channel. No timeout need by the control software.
-            cur = self._drv.query("READ?")
-            if tstamp == "ON":
-                val, ts = cur.split(',')
-                meas_out.addMeasures(float(val), float(ts))
-            else: 
-                meas_out.addMeasures(float(cur))
-            k += 1
+        async with self._measuring() :
+            while samples < 0 or k < samples :
+                n = block if samples < 0 else min(block, samples - k)
+                if n != cur_block :
+                    await self._drv.writeAsync("TRIG:COUNT %d" % n)
+                    cur_block = n
+                # *OPC sets the bit 0 of ESR when the block is completed, *CLS
+                # clears the one left by a cancelled run
+                await self._drv.writeAsync("*CLS;INIT;*OPC", wait=False)
+                while not int(await self._drv.queryAsync("*ESR?")) & 0x1 :
+                    await asyncio.sleep(self.poll_time)
+                ret = await self._drv.queryRawAsync("FETCH:ARRAY? %d" % n, length=n * width + 64)
+                vals = self._parseArray(ret[:-1])
+                if len(vals) == 0 :
+                    logging.warning("Empty answer to FETCH:ARRAY? %d" % n)
+                elif tstamp :
+                    # Contiguous columns for MeasuredData
+                    values, tstamps = np.ascontiguousarray(vals.reshape(-1, 2).T)
+                    meas_out.addMeasures(values, tstamps)
+                else :
+                    meas_out.addMeasures(vals)
+                logging.debug("Block of %d samples fetched" % n)
+                k += n
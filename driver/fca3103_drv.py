@@ -27,97 +27,73 @@ Driver for the Tektronix FCA 3103 Timer/Counter/Analyzer
 #-------------------------------------------------------------------------------
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
-# Import system modules
-import time
-
 # User modules
-from driver.gen_usbtmc import *
+from driver.gen_drv import Gen_drv
+from driver.transport import Interfaces, openTransport
 
-class FCA3103_drv() :
+class FCA3103_drv(Gen_drv) :
     '''
     Tektronix FCA 3103 driver.
     '''
 
-    def __init__(self, port,full_support=False) :
+    ## Fixed delay (s) after each command, only for firmwares without *OPC?
+    delay = None
+    ## Size (bytes) of the input buffer of the instrument
+    input_buffer = 256
+
+    def __init__(self, port, full_support=False, delay=None, timeout=5, shadow=True,
+                 serial=None, transport=None) :
         '''
         Constructor
 
         Args:
             port (int) : Port index of usbtmc device (from 0 to 16)
-            full_support (boolean) : Indicates if custom usbtmc driver is loaded
+            full_support (boolean) : Deprecated and ignored, the device
+                                     information is always taken from *IDN?
+            delay (float) : Fallback delay (s) after each command. When None,
+                            the driver waits for command completion (*OPC?)
+            timeout (float) : Max. time (s) waiting for an answer of the device
+            shadow (boolean) : Don't send the settings already applied (see StateCache)
+            serial (dict) : Use the serial port /dev/ttyACM<port> (or the
+                            device file port) with these Gen_serial args
+                            (baudrate, flow) instead of usbtmc
+            transport (Transport) : An open transport, port is ignored
         '''
-        self.driver = Gen_usbtmc(port,full_support)
-
-        if full_support :
-            devices = self.driver.listDevices()
-            lines = devices.splitlines()
-
-            self.manufacturer = lines[port].split('\t')[1]
-            self.device = lines[port].split('\t')[2]
-            self.serial = lines[port].split('\t')[3]
-        else :
-            info = self.query("*IDN?")
-            self.manufacturer = info.split(",")[0]
-            self.device = info.split(",")[1]
-            self.serial = info.split(",")[2]
+        if transport is None :
+            if serial is not None :
+                transport = openTransport(Interfaces.usb_acm, port, timeout, **serial)
+            else :
+                transport = openTransport(Interfaces.usb, port, timeout)
+        Gen_drv.__init__(self, transport, delay, shadow)
 
     # ------------------------------------------------------------------------ #
 
-    def deviceInfo(self) :
+    def _send(self, cmd, wait=True) :
         '''
-        Method to retrieve device information.
+        Method to send a message to the instrument (see write).
 
-        Returns:
-            A string with manufacturer, device name and serial number.
-        '''
-        return ("%s %s (s/n : %s)" % (self.manufacturer, self.device, self.serial))
-
-    # ------------------------------------------------------------------------ #
-
-    def query(self, cmd, length=100) :
-        '''
-        Method to write a command and read the result.
+        When wait is enabled, the method returns as soon as the instrument
+        has completed the command: *OPC? is appended to the same message and
+        its answer is read back. If a fallback delay is set, it waits that
+        time instead.
 
         Args:
-            cmd (str) :  A SCPI valid command for the device.
-            length (int) : Length of the input read. Default : 100.
-
-        Returns:
-            Command "cmd" response.
-        '''
-        self.driver.write(str.encode(cmd))
-        time.sleep(1)
-        ret = self.driver.read(length)[:-1]
-
-        return bytes.decode(ret)
-
-    # ------------------------------------------------------------------------ #
-
-    def read(self, length=1) :
+            cmd (str) : The message
+            wait (boolean) : Wait until the command is completed.
         '''
-        Method to read from output buffer of the instrument
+        if self.delay is not None or not wait :
+            Gen_drv._send(self, cmd)
+        else :
+            self.inst.query("%s;*OPC?" % cmd)
 
-        Args:
-            length (int) : Number of bytes to read. Default : 1.
-        '''
-        ret = self.driver.read(length)[:-1]
-        return bytes.decode(ret)
+    async def _sendAsync(self, cmd, wait=True) :
+        if self.delay is not None or not wait :
+            await Gen_drv._sendAsync(self, cmd)
+        else :
+            await self.inst.queryAsync("%s;*OPC?" % cmd)
 
     # ------------------------------------------------------------------------ #
 
-    def write(self, cmd, check=False) :
-        '''
-        Method for writing to input buffer of the instrument.
-
-        Args:
-            cmd (str) : A SCPI valid command for the device.
-            check (boolean) : When true the driver will ask for errors in previous command.
-
-        Returns:
-            If check=True it returns a tuple (error code,error message).
-        '''
-        self.driver.write(str.encode(cmd))
-        time.sleep(1)
-
-        if check :
-            return self.query("syst:err?")
+    def _messageLimit(self) :
+        # Leave room for the *OPC? appended by _send
+        return self.input_buffer - len(";*OPC?")
@@ -0,0 +1,377 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Common driver for the SCPI instruments.
+
+The drivers of the instruments (FCA3103_drv, KS53230_drv) extend Gen_drv
+with their own quirks. The messages go through a Transport, so any of
+them can be used with any interface (see transport.openTransport).
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup measurement
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import time
+import asyncio
+import logging
+import contextlib
+
+# User modules
+from driver.scpi import joinCommands, CommandBatch, StateCache
+
+class Gen_drv() :
+    '''
+    Generic driver for a SCPI instrument.
+
+    Writes are pipelined: they return as soon as the command is sent, and the
+    instrument executes them in order.
+
+    The methods that wait for the instrument have a coroutine version (the
+    "Async" suffix) for the asyncio API of the counters.
+    '''
+
+    ## Fixed delay (s) after each write, None for pipelined writes
+    delay = None
+    ## Size (bytes) of the input buffer of the instrument
+    input_buffer = 256
+
+    def __init__(self, transport, delay=None, shadow=True) :
+        '''
+        Constructor
+
+        Args:
+            transport (Transport) : Connection with the instrument
+            delay (float) : Fallback delay (s) after each write. Default : None.
+            shadow (boolean) : Don't send the settings already applied (see StateCache)
+        '''
+        self.delay = delay
+        self._batch = None
+        ## Known settings of the device, None to send every write
+        self.state = StateCache() if shadow else None
+        ## The transport (Transport)
+        self.inst = transport
+
+        ## Answer to *IDN?, also used to resynchronize (see abortAsync)
+        self.idn = self.query("*IDN?")
+        info = self.idn.split(",")
+        self.manufacturer = info[0]
+        self.device = info[1]
+        self.serial = info[2]
+
+    # ------------------------------------------------------------------------ #
+
+    @property
+    def pipeline(self) :
+        '''
+        Max. number of queries sent before reading their answers (see postQuery)
+        '''
+        return self.inst.pipeline
+
+    # ------------------------------------------------------------------------ #
+
+    def deviceInfo(self) :
+        '''
+        Method to retrieve device information.
+
+        Returns:
+            A string with manufacturer, device name and serial number.
+        '''
+        return ("%s %s (s/n : %s)" % (self.manufacturer, self.device, self.serial))
+
+    # ------------------------------------------------------------------------ #
+
+    def _beforeQuery(self, cmd) :
+        '''
+        Pending commands of a batch must reach the device before a query
+        '''
+        if self._batch :
+            self._flushBatch(self._batch)
+            self._batch = []
+        if self.state is not None :
+            self.state.update(cmd)
+
+    async def _beforeQueryAsync(self, cmd) :
+        if self._batch :
+            await self._flushBatchAsync(self._batch)
+            self._batch = []
+        if self.state is not None :
+            self.state.update(cmd)
+
+    # ------------------------------------------------------------------------ #
+
+    def query(self, cmd, length=None) :
+        '''
+        Method to write a command and read the result.
+
+        Args:
+            cmd (str) :  A SCPI valid command for the device.
+            length (int) : Expected length (bytes) of the answer.
+
+        Returns:
+            Command "cmd" response (str).
+        '''
+        self._beforeQuery(cmd)
+        return self.inst.query(cmd, length)
+
+    async def queryAsync(self, cmd, length=None) :
+        '''
+        Coroutine version of query
+        '''
+        await self._beforeQueryAsync(cmd)
+        return await self.inst.queryAsync(cmd, length)
+
+    # ------------------------------------------------------------------------ #
+
+    def queryRaw(self, cmd, length=None) :
+        '''
+        Method to write a command and read the raw result, i.e. binary blocks.
+
+        Args:
+            cmd (str) :  A SCPI valid command for the device.
+            length (int) : Expected length (bytes) of the answer.
+
+        Returns:
+            Command "cmd" response (a memoryview, terminator included),
+            valid until the next read.
+        '''
+        self._beforeQuery(cmd)
+        return self.inst.queryRaw(cmd, length)
+
+    async def queryRawAsync(self, cmd, length=None) :
+        '''
+        Coroutine version of queryRaw
+        '''
+        await self._beforeQueryAsync(cmd)
+        return await self.inst.queryRawAsync(cmd, length)
+
+    # ------------------------------------------------------------------------ #
+
+    def postQuery(self, cmd) :
+        '''
+        Method to send a query without waiting for its answer (see fetchRaw).
+
+        Up to "pipeline" queries can be pending, so the device starts the
+        next one as soon as it completes the previous one. If the interface
+        can't pipeline, the query is sent by fetchRaw.
+
+        Args:
+            cmd (str) :  A SCPI valid query for the device.
+        '''
+        self._beforeQuery(cmd)
+        self.inst.post(cmd)
+
+    # ------------------------------------------------------------------------ #
+
+    def fetchRaw(self, length=None) :
+        '''
+        Method to read the raw answer of the oldest query sent with postQuery.
+
+        Args:
+            length (int) : Expected length (bytes) of the answer.
+
+        Returns:
+            The answer (memoryview, see queryRaw).
+        '''
+        return self.inst.fetch(length)
+
+    async def fetchRawAsync(self, length=None) :
+        '''
+        Coroutine version of fetchRaw
+        '''
+        return await self.inst.fetchAsync(length)
+
+    # ------------------------------------------------------------------------ #
+
+    def read(self, length=None) :
+        '''
+        Method to read from output buffer of the instrument
+
+        Args:
+            length (int) : Expected length (bytes) of the answer.
+        '''
+        return self.inst.read(length)
+
+    # ------------------------------------------------------------------------ #
+
+    def _queue(self, cmd) :
+        '''
+        Method to skip the settings already applied and to collect the
+        commands of a batch.
+
+        Returns:
+            True if the command must be sent now.
+        '''
+        if self.state is not None and not self.state.update(cmd) :
+            logging.debug("Already applied: %s" % cmd)
+        elif self._batch is not None :
+            self._batch.append(cmd)
+        else :
+            return True
+        return False
+
+    # ------------------------------------------------------------------------ #
+
+    def write(self, cmd, check=False, wait=True) :
+        '''
+        Method for writing to input buffer of the instrument.
+
+        Inside a batch() block the command is queued and sent when the
+        block ends. Settings already applied to the device are not sent.
+
+        Args:
+            cmd (str) : A SCPI valid command for the device.
+            check (boolean) : When true the driver will ask for errors in previous command.
+            wait (boolean) : Wait until the command is completed, for the
+                             drivers that check each command (see _send).
+
+        Returns:
+            If check=True it returns a tuple (error code,error message).
+        '''
+        if self._queue(cmd) :
+            with self._sending() :
+                self._send(cmd, wait)
+
+        if check :
+            return self.query("syst:err?")
+
+    async def writeAsync(self, cmd, check=False, wait=True) :
+        '''
+        Coroutine version of write
+        '''
+        if self._queue(cmd) :
+            with self._sending() :
+                await self._sendAsync(cmd, wait)
+
+        if check :
+            return await self.queryAsync("syst:err?")
+
+    # ------------------------------------------------------------------------ #
+
+    @contextlib.contextmanager
+    def _sending(self) :
+        '''
+        Context of the sends: the known settings already took the commands,
+        so they are forgotten when a send fails (the device may not have
+        applied them)
+        '''
+        try :
+            yield
+        except BaseException :
+            self.resync()
+            raise
+
+    def _send(self, cmd, wait=True) :
+        '''
+        Method to send a message to the instrument (see write).
+
+        Args:
+            cmd (str) : The message
+            wait (boolean) : Wait until the command is completed. Writes are
+                             pipelined, only the fallback delay is applied.
+        '''
+        self.inst.write(cmd)
+        if self.delay is not None :
+            time.sleep(self.delay)
+
+    async def _sendAsync(self, cmd, wait=True) :
+        self.inst.write(cmd)
+        if self.delay is not None :
+            await asyncio.sleep(self.delay)
+
+    async def abortAsync(self, cmd="ABOR") :
+        '''
+        Coroutine to stop a measurement interrupted in the middle of an
+        exchange (i.e. a cancelled coroutine)
+
+        The command is sent when the last read is over, and the answers
+        still pending are discarded up to the one of *IDN? (see
+        Transport.discard), so the device can be used again.
+
+        Args:
+            cmd (str) : Command that stops the measurement
+        '''
+        self._batch = None
+        await self.inst.idleAsync()
+        self.inst.write(cmd)
+        await self.inst.discardAsync(("*IDN?", self.idn))
+
+    # ------------------------------------------------------------------------ #
+
+    def resync(self) :
+        '''
+        Method to forget the known settings of the device, so the next
+        writes are sent (i.e. after using the front panel).
+        '''
+        if self.state is not None :
+            self.state.invalidate()
+
+    # ------------------------------------------------------------------------ #
+
+    def batch(self) :
+        '''
+        Method to coalesce the following writes in as few messages as possible.
+
+        Usage:
+            with drv.batch() :
+                drv.write("INPUT1:COUPLING DC")
+                drv.write("INPUT1:IMPedance 50")
+
+        Returns:
+            A context manager (CommandBatch).
+        '''
+        return CommandBatch(self)
+
+    # ------------------------------------------------------------------------ #
+
+    def _flushBatch(self, cmds) :
+        '''
+        Method to send the commands collected by a batch.
+
+        Args:
+            cmds (list) : The collected commands
+        '''
+        with self._sending() :
+            for msg in joinCommands(cmds, self._messageLimit()) :
+                self._send(msg)
+
+    async def _flushBatchAsync(self, cmds) :
+        with self._sending() :
+            for msg in joinCommands(cmds, self._messageLimit()) :
+                await self._sendAsync(msg)
+
+    # ------------------------------------------------------------------------ #
+
+    def _messageLimit(self) :
+        '''
+        Max. length of the messages sent by a batch
+        '''
+        return self.input_buffer
+
+    # ------------------------------------------------------------------------ #
+
+    def close(self) :
+        '''
+        Method to close the connection with the instrument
+        '''
+        self.inst.close()
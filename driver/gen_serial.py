@@ -0,0 +1,119 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+This file contains a generic driver for instruments on a serial port.
+
+The USB CDC-ACM class (/dev/ttyACM<n>) and the RS-232 ports carry the SCPI
+messages as a byte stream, so the messages are ended by a new line and
+the answers are framed on the host (see Transport).
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup measurement
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import os
+import fcntl
+import termios
+
+# User modules
+from driver.transport import FileTransport
+
+## Flow control modes of the serial port
+FLOW_CONTROL = (None, "rtscts", "xonxoff")
+
+class Gen_serial(FileTransport) :
+    '''
+    Transport for an instrument on a serial port.
+
+    The port is used in raw, non-blocking mode: each read waits (poll) up
+    to the timeout for new data.
+
+    Usage:
+        inst = Gen_serial("/dev/ttyACM0", baudrate=115200, flow="rtscts")
+        print(inst.query("*IDN?"))
+    '''
+    ## Prefix of the device files of the numbered ports
+    prefix = "/dev/ttyACM"
+
+    def __init__(self, port, baudrate=115200, flow=None, timeout=5, pipeline=1) :
+        '''
+        Constructor
+
+        Args:
+            port (int or str) : Index of /dev/ttyACM<port> or a device file
+            baudrate (int) : Bit rate, ignored by the CDC-ACM devices
+            flow (str) : Flow control, one of FLOW_CONTROL
+            timeout (float) : Max. time (s) waiting for data of an answer
+            pipeline (int) : Max. number of pending answers (see Transport.post)
+        '''
+        path = "%s%d" % (self.prefix, port) if isinstance(port, int) else port
+        FileTransport.__init__(self, path, timeout, pipeline, flags=os.O_NOCTTY)
+        flags = fcntl.fcntl(self.device, fcntl.F_GETFL)
+        fcntl.fcntl(self.device, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self.configure(baudrate, flow)
+
+    def configure(self, baudrate, flow=None) :
+        '''
+        Set the serial port in raw mode (8N1) with the given bit rate and
+        flow control
+
+        Args:
+            baudrate (int) : Bit rate
+            flow (str) : Flow control, one of FLOW_CONTROL
+
+        Raises:
+            ValueError for a bit rate or flow control not supported.
+        '''
+        if flow not in FLOW_CONTROL :
+            raise ValueError("Flow control not valid (%s)" % flow)
+        speed = getattr(termios, "B%d" % baudrate, None)
+        if speed is None :
+            raise ValueError("Baud rate not supported (%d)" % baudrate)
+        iflag, oflag, cflag, lflag, ispeed, ospeed, cc = termios.tcgetattr(self.device)
+        iflag &= ~(termios.IGNBRK | termios.BRKINT | termios.PARMRK | termios.ISTRIP |
+                   termios.INLCR | termios.IGNCR | termios.ICRNL | termios.IXON |
+                   termios.IXOFF | termios.IXANY)
+        oflag &= ~termios.OPOST
+        lflag &= ~(termios.ECHO | termios.ECHONL | termios.ICANON | termios.ISIG |
+                   termios.IEXTEN)
+        cflag &= ~(termios.CSIZE | termios.PARENB | termios.CSTOPB | termios.CRTSCTS)
+        cflag |= termios.CS8 | termios.CREAD | termios.CLOCAL
+        if flow == "rtscts" :
+            cflag |= termios.CRTSCTS
+        elif flow == "xonxoff" :
+            iflag |= termios.IXON | termios.IXOFF
+        cc[termios.VMIN] = 1
+        cc[termios.VTIME] = 0
+        termios.tcsetattr(self.device, termios.TCSANOW,
+                          [iflag, oflag, cflag, lflag, speed, speed, cc])
+        self.baudrate = baudrate
+        self.flow = flow
+
+    def clear(self) :
+        '''
+        Discard the received data not read yet (i.e. the rest of an answer
+        after a timeout)
+        '''
+        termios.tcflush(self.device, termios.TCIFLUSH)
+        self._start = self._end = 0
@@ -0,0 +1,91 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+This file contains a generic driver for instruments with a raw SCPI socket.
+
+Most LAN instruments (i.e. the Keysight 53230A) accept SCPI messages on a
+TCP port (5025), without the RPC layer of vxi11. The messages are ended
+by a new line and the answers are framed on the host (see Transport).
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup measurement
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import socket
+
+# User modules
+from driver.transport import Transport
+
+## Default port of the raw SCPI socket
+SCPI_PORT = 5025
+
+class Gen_socket(Transport) :
+    '''
+    Transport for a raw SCPI socket.
+
+    The device executes the messages in order, so several queries can be
+    pending (see Transport.post).
+
+    Usage:
+        inst = Gen_socket("192.168.0.6")
+        print(inst.query("*IDN?"))
+        answers = inst.queryMany(["READ?"] * 10)
+    '''
+
+    def __init__(self, host, port=SCPI_PORT, timeout=5, pipeline=8) :
+        '''
+        Constructor
+
+        Args:
+            host (str) : Address of the instrument, "host" or "host:port"
+            port (int) : TCP port, used when host doesn't include it
+            timeout (float) : Max. time (s) waiting for data of an answer
+            pipeline (int) : Max. number of pending answers (see Transport.post)
+        '''
+        Transport.__init__(self, timeout, pipeline)
+        if ":" in host :
+            host, port = host.rsplit(":", 1)
+        self.sock = socket.create_connection((host, int(port)), timeout)
+        # The messages are short, don't wait to fill a segment
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def setTimeout(self, timeout) :
+        self.timeout = timeout
+        self.sock.settimeout(timeout)
+        return True
+
+    def _send(self, data) :
+        self.sock.sendall(data)
+
+    def fileno(self) :
+        return self.sock.fileno()
+
+    def _recvInto(self, view) :
+        try :
+            return self.sock.recv_into(view)
+        except socket.timeout :
+            raise TimeoutError("No answer from the device")
+
+    def _close(self) :
+        self.sock.close()
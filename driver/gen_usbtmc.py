@@ -29,51 +29,89 @@ This file contains a generic userspace driver for usbtmc devices.
 #-------------------------------------------------------------------------------
 # Import system modules
 import os
+import fcntl
+import struct
+import logging
 
-class Gen_usbtmc() :
+# User modules
+from driver.transport import FileTransport
+
+## ioctl to set the timeout (ms) of the usbtmc kernel driver: _IOW('[', 10, __u32)
+USBTMC_IOCTL_SET_TIMEOUT = 0x40045B0A
+
+class Gen_usbtmc(FileTransport) :
     '''
+    Transport for a usbtmc device.
 
+    The usbtmc kernel driver blocks each read up to its own timeout (see
+    setTimeout). Other devices (i.e. a pty used as stand-in) are polled,
+    so the timeout is enforced by the host, and the messages sent to them
+    are ended by a new line.
     '''
-    device = "/dev/usbtmc"
+    ## The end of the USB transfer ends the message, no terminator is needed
+    term = b""
 
-    def __init__(self, port, full_support=False):
+    def __init__(self, port, full_support=False, timeout=None, path=None):
         '''
         Constructor
 
         Args:
             port (int) : Port
             full_support (boolean) : Indicates if /dev/usbtmc0 is accessible
+            timeout (float) : Read timeout (s), None keeps the kernel default (5 s)
+            path (str) : Device file to use instead of /dev/usbtmc<port>
         '''
-
+        if path is None :
+            path = "/dev/usbtmc%d" % port
+        # A device file that isn't a usbtmc node can be polled
+        pollable = not os.path.basename(path).startswith("usbtmc")
+        FileTransport.__init__(self, path, timeout, pollable=pollable,
+                               flags=os.O_NOCTTY if pollable else 0)
+        if pollable :
+            # Nothing frames the messages but the terminator
+            self.term = b"\n"
         if full_support :
             self.driver = os.open("/dev/usbtmc0" ,os.O_RDWR)
         else :
             self.driver = None
-        self.device = os.open(("/dev/usbtmc%d" % port), os.O_RDWR)
-
-    def listDevices(self) :
-        '''
-        Method for listing detected devices using USBTMC interface.
-        '''
-        if self.driver != None :
-            return os.read(self.driver, 100)
-        else : return None
 
+        if timeout is not None :
+            self.setTimeout(timeout)
 
-    def write(self, cmd):
+    def setTimeout(self, timeout):
         '''
-        Write
+        Set the timeout for the blocking reads
+
+        A read in the usbtmc driver blocks until the instrument answers, so
+        this timeout is the upper bound for a query to complete.
 
         Args:
-            cmd (str) : A command to write
-        '''
-        os.write(self.device, cmd)
+            timeout (float) : Timeout in seconds
 
-    def read(self, length = 1):
+        Returns:
+            True if the kernel driver accepted the new timeout.
         '''
-        Read
+        self.timeout = timeout
+        if self.pollable :
+            return True
+        try:
+            fcntl.ioctl(self.device, USBTMC_IOCTL_SET_TIMEOUT,
+                        struct.pack("I", int(timeout * 1000)))
+        except OSError as e:
+            # Old kernels don't support the ioctl, the default timeout is used
+            logging.warning("Unable to set the usbtmc timeout: %s" % str(e))
+            return False
+        return True
 
-        Args:
-            length (int) : Number of bytes to be read
+    def listDevices(self) :
+        '''
+        Method for listing detected devices using USBTMC interface.
         '''
-        return os.read(self.device, length)
+        if self.driver != None :
+            return os.read(self.driver, 100)
+        else : return None
+
+    def _close(self):
+        FileTransport._close(self)
+        if self.driver is not None :
+            os.close(self.driver)
@@ -0,0 +1,91 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+This file contains the transport for vxi11 instruments (python-vxi11).
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup measurement
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import vxi11
+
+# User modules
+from driver.scpi import messageEnd
+from driver.transport import Transport
+
+class Gen_vxi11(Transport) :
+    '''
+    Transport for a vxi11 instrument.
+
+    The RPC layer delivers whole messages, so each read returns one answer
+    and the queries can't be pipelined. The messages go through the input
+    buffer of Transport as in the other interfaces.
+    '''
+    ## The END flag of the RPC ends the message, no terminator is needed
+    term = b""
+
+    def __init__(self, host, timeout=5) :
+        '''
+        Constructor
+
+        Args:
+            host (str) : Address of the instrument
+            timeout (float) : Max. time (s) waiting for an answer
+        '''
+        Transport.__init__(self, timeout)
+        # Bytes of the last message not moved to the input buffer yet
+        self._rest = None
+        self.inst = vxi11.Instrument(host)
+        if timeout is not None :
+            self.inst.timeout = timeout
+
+    def setTimeout(self, timeout) :
+        self.timeout = timeout
+        self.inst.timeout = timeout
+        return True
+
+    def _send(self, data) :
+        self.inst.write_raw(data)
+
+    def _recvInto(self, view) :
+        # The RPC layer returns whole messages, the part that doesn't fit in
+        # view is kept for the next call
+        if not self._rest :
+            try :
+                data = self.inst.read_raw()
+            except vxi11.vxi11.Vxi11Exception as e :
+                if e.err == vxi11.vxi11.ERR_IO_TIMEOUT :
+                    raise TimeoutError("No answer from the device")
+                raise
+            if messageEnd(data, len(data)) != len(data) :
+                # The END flag ended the message, add the terminator for the framing
+                data += b"\n"
+            self._rest = memoryview(data)
+        n = min(len(view), len(self._rest))
+        view[:n] = self._rest[:n]
+        self._rest = self._rest[n:]
+        return n
+
+    def _close(self) :
+        self.inst.close()
@@ -32,24 +32,64 @@ And some common commands to manage the instrument.
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
 import abc
-import enum
+import asyncio
+import contextlib
+import json
+import hashlib
 import logging
 
+from driver.config import tokenize
+from driver.scpi import joinCommands, StateCache
+# The interfaces are part of the API of the counters
+from driver.transport import Interfaces
+from misc.outlier_filter import OutlierFilter
+
 
 __meas_instr__ = "GenCounter"
 
-class Interfaces(enum.Enum) :
+def _fingerprint(obj) :
+    '''
+    Hash of an object that can be serialized as JSON (None for None)
+    '''
+    if obj is None :
+        return None
+    return hashlib.sha1(json.dumps(obj, sort_keys=True).encode()).hexdigest()
+
+def runSync(coro) :
     '''
-    This class represents the supported interfaces in the instruments.
+    Run a coroutine of the asyncio API until it's completed
+
+    The blocking methods of the counters are wrappers of their coroutine
+    version (the "Async" suffix), see GenCounter.
+
+    Args:
+        coro (coroutine) : The coroutine
+
+    Returns:
+        The result of the coroutine.
+
+    Raises:
+        RuntimeError when it's called from a running event loop, the
+        coroutine must be awaited there.
     '''
-    usb      = 0
-    usb_acm  = 1
-    vxi11    = 2
+    try :
+        asyncio.get_running_loop()
+    except RuntimeError :
+        return asyncio.run(coro)
+    coro.close()
+    raise RuntimeError("Called from an event loop, await the Async method instead")
 
 class GenCounter() :
     '''
     Abstract class to define the API for a Frequency Counter/Timer
+
+    The measurements that stream samples have an asyncio version (the "Async"
+    suffix), so one event loop can drive several counters:
+        await asyncio.gather(fca.timeIntervalAsync(cfg, d1),
+                             ks.timeIntervalAsync(cfg, d2))
+    The blocking method is a wrapper that runs the coroutine (see runSync).
     '''
     __metaclass__ = abc.ABCMeta
 
@@ -77,6 +117,15 @@ class GenCounter() :
     ## Trigger system saved configuration
     _trigcfg = None
 
+    ## Outlier rejection method used when skip_values is set ("window" or "mad")
+    _filterMethod = "window"
+
+    ## Number of samples used for the rolling median of the outlier rejection
+    _filterWindow = 64
+
+    ## Container for the rejected samples (None to only count them)
+    _rejectedOut = None
+
 
     @abc.abstractmethod
     def __init__(self, interface, port, name=None) :
@@ -148,14 +197,24 @@ class GenCounter() :
             meas_out (MeasuredData) : Data container
         '''
 
-    @abc.abstractmethod
     def timeInterval(self, cfgstr, meas_out) :
         '''
-        Method to measure Time Interval between the input channels
+        Method to measure Time Interval between the input channels (blocking
+        version of timeIntervalAsync)
+        '''
+        return runSync(self.timeIntervalAsync(cfgstr, meas_out))
+
+    @abc.abstractmethod
+    async def timeIntervalAsync(self, cfgstr, meas_out, start=None) :
+        '''
+        Coroutine to measure Time Interval between the input channels
 
         Args:
             cfgstr (str) : A string containing valid params
             meas_out (MeasuredData) : Data container
+            start (coroutine function) : Awaited after the configuration,
+                                         before arming the device (see
+                                         driver.acquisition)
 
         The expected params in this method are:
             ref (int) : The channel used as reference
@@ -167,6 +226,23 @@ class GenCounter() :
             imp (int or str) : impedance range 50 - 1000000, (imp:1000000)
         '''
 
+    @contextlib.asynccontextmanager
+    async def _measuring(self) :
+        '''
+        Context of the loops that take the samples: when they are interrupted
+        (an error or a cancelled coroutine, i.e. Acquisition.runAsync with a
+        duration), the device is stopped and the answers still pending are
+        discarded, so the counter can measure again.
+        '''
+        try :
+            yield
+        except BaseException :
+            try :
+                await self._drv.abortAsync()
+            except Exception as e :
+                logging.warning("Unable to stop the measurement: %s" % str(e))
+            raise
+
     @abc.abstractmethod
     def freqRatio(self, cfgstr, meas_out) :
         '''
@@ -192,6 +268,170 @@ class GenCounter() :
             meas_out (MeasuredData) : Data container
         '''
 
+    def saveSetup(self, ofile, slot=None, key=None) :
+        '''
+        Method to save the current setup of the device in a profile
+
+        The profile is a JSON file with the settings applied through the
+        driver (see driver.scpi.StateCache), the identification of the
+        device and a fingerprint of both. Optionally, the setup is also
+        stored in a memory slot of the device (*SAV).
+
+        Args:
+            ofile (str) : Name of the profile file
+            slot (int) : Memory slot of the device, None to not use it
+            key : Identifies the configuration (i.e. the config strings),
+                  it must be serializable as JSON
+        '''
+        if self._drv.state is None :
+            raise RuntimeError("The shadow state of the driver is disabled")
+        settings = self._drv.state.snapshot()
+        if slot is not None :
+            self._drv.write("*SAV %d" % slot)
+        profile = {"device" : self._drv.deviceInfo(), "slot" : slot,
+                   "key" : _fingerprint(key), "settings" : settings}
+        profile["fingerprint"] = _fingerprint(profile)
+        with open(ofile, "w") as f :
+            json.dump(profile, f, indent=1)
+        logging.debug("Setup saved to %s (%d settings)" % (ofile, len(settings)))
+
+    def recallSetup(self, ifile, key=None) :
+        '''
+        Method to restore a setup saved with saveSetup
+
+        The setup is recalled from the memory slot of the device (*RCL), or
+        all the settings are sent in as few messages as possible. Then it's
+        checked with a single query (see verifySetup).
+
+        Args:
+            ifile (str) : Name of the profile file
+            key : The same value passed to saveSetup
+
+        Returns:
+            True if the setup was restored, False if the profile is not
+            valid for this device and key, or the check failed.
+        '''
+        try :
+            with open(ifile, "r") as f :
+                profile = json.load(f)
+            fp = profile.pop("fingerprint")
+            device, pkey, slot = profile["device"], profile["key"], profile["slot"]
+            settings = [(header, params) for header, params in profile["settings"]]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e :
+            # Unreadable, truncated or from an older version
+            logging.warning("Unable to load the setup profile %s: %s" % (ifile, str(e)))
+            return False
+        if fp != _fingerprint(profile) or device != self._drv.deviceInfo() \
+           or pkey != _fingerprint(key) :
+            logging.info("The setup profile %s doesn't match" % ifile)
+            return False
+
+        self._drv.resync()
+        if slot is not None :
+            self._drv.write("*RCL %d" % slot)
+        else :
+            with self._drv.batch() :
+                for header, params in settings :
+                    self._drv.write("%s %s" % (header, params))
+        if not self.verifySetup(settings) :
+            self._drv.resync()
+            return False
+        if self._drv.state is not None :
+            self._drv.state.load(settings)
+        logging.debug("Setup recalled from %s" % ifile)
+        return True
+
+    def verifySetup(self, settings) :
+        '''
+        Method to check the settings of the device
+
+        All the settings are queried in a single message (or as few as the
+        input buffer of the device allows). The settings applied as MIN, MAX
+        or DEF are compared with the value the device gives for them.
+
+        Args:
+            settings (list) : A list of [header, parameters] (see StateCache.snapshot)
+
+        Returns:
+            True if the device has all the settings.
+        '''
+        items = [(h, p) for h, p in settings if not h.startswith("CONF")]
+        queries = []
+        for h, p in items :
+            queries.append("%s?" % h)
+            if p in StateCache.symbolic :
+                queries.append("%s? %s" % (h, p))
+        answers = []
+        for msg in joinCommands(queries, self._drv.input_buffer) :
+            answers += self._drv.query(msg, 32 * (msg.count(";") + 1) + 64).split(";")
+        if len(answers) != len(queries) :
+            logging.info("Setup check failed: %d answers for %d queries"
+                         % (len(answers), len(queries)))
+            return False
+        answers = iter(answers)
+        for header, params in items :
+            ans = next(answers)
+            if params in StateCache.symbolic :
+                params = StateCache.canonical(next(answers))
+            if StateCache.canonical(ans) != params :
+                logging.info("Setup check failed: %s is %s instead of %s"
+                             % (header, ans.strip(), params))
+                return False
+        return True
+
+    def warmStart(self, profile, configure, key=None, slot=None) :
+        '''
+        Method to bring the device to a known setup as fast as possible
+
+        If the profile matches the device and the key, the setup is
+        recalled from it. Otherwise, the device is reset, configure() is
+        called to apply the setup and the profile is saved for the next run.
+
+        Usage:
+            counter.warmStart("counter_setup.json", configure, key=cfg_str)
+
+        Args:
+            profile (str) : Name of the profile file
+            configure (callable) : Function that applies the setup after a reset
+            key : Identifies the configuration (i.e. the config strings)
+            slot (int) : Memory slot of the device used to store the setup
+
+        Returns:
+            True if the setup was recalled, False if it was applied from scratch.
+        '''
+        if os.path.exists(profile) and self.recallSetup(profile, key) :
+            return True
+        self.resetDevice()
+        configure()
+        self.saveSetup(profile, slot, key)
+        return False
+
+    def filterOutput(self, meas_out) :
+        '''
+        Method to put the outlier rejection stage in front of a data container
+
+        When the skip_values attribute of the instrument is set, the samples
+        farther than error (ps) from the rolling median are rejected (see
+        misc.outlier_filter). Otherwise, meas_out is returned as is.
+
+        The filter is kept in the outlier_filter attribute, so the number
+        of accepted and rejected samples can be checked during or after the
+        measurement.
+
+        Args:
+            meas_out (MeasuredData) : Data container
+
+        Returns:
+            The object where the measurement loop must add the samples.
+        '''
+        if not getattr(self, "skip_values", False) :
+            return meas_out
+        self.outlier_filter = OutlierFilter(meas_out, method=self._filterMethod,
+                                            window=self._filterWindow,
+                                            limit=self.error * 1e-12,
+                                            rejected=self._rejectedOut)
+        return self.outlier_filter
+
     def parseConfig(self, cfgstr) :
         '''
         Method to parse a configuration string
@@ -205,7 +445,8 @@ class GenCounter() :
 
         The parseConfig method doesn't filters out any token. The
         other caller method should take only the needed tokens
-        from the dict.
+        from the dict. The measurement methods use the typed config
+        classes instead (see driver.config).
 
         Args:
             cfgstr (str) : A string containing a configuration chain.
@@ -214,12 +455,5 @@ class GenCounter() :
             logging.warning("Empty cfg string passed to the Config Parser")
             return ""
 
-        cfgstr = cfgstr.strip()
-        cfgdict = {}
-
-        for s in cfgstr.split(" ") :
-            if s[0] == " " : continue
-            key, val = s.split(":")
-            cfgdict[key] = val
-
-        return cfgdict
+        # The tokenization of each string is cached
+        return dict(tokenize(cfgstr))
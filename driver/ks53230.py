@@ -30,12 +30,16 @@ Universal Frequency Counter/Timer.
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
 # Import system modules
-import re
 import time
+import asyncio
 
 # User modules
-from driver.gencounter import GenCounter, Interfaces
+from driver.gencounter import GenCounter, Interfaces, runSync
+from driver.transport import openTransport
 from driver.ks53230_drv  import KS53230_drv
+from driver.scpi import parseBlock
+from driver.config import TrigLevelConfig, TriggerConfig, TimeIntervalConfig, \
+                          FreqConfig, PeriodConfig
 
 # This attribute permits dynamic loading inside wrcalibration class.
 __meas_instr__ = "KS53230"
@@ -61,8 +65,16 @@ class KS53230(GenCounter) :
     step = 5
     ## How much time (s) wait between consecutive read of samples
     deadtime = 1
-
-    def __init__(self, interface, port, logger,name=None) :
+    ## Drain the error queue (SYST:ERR?) at the end of each configuration block
+    check_errors = False
+    ## Readings fetched on each iteration of the streaming loop (target)
+    chunk = 1000
+    ## Min. time (s) between polls of the reading memory when streaming
+    min_poll = 0.01
+    ## Max. readings taken after each INIT (size of the reading memory)
+    max_readings = 1000000
+
+    def __init__(self, interface, port, logger,name=None, serial=None) :
         '''
         Constructor
 
@@ -70,6 +82,8 @@ class KS53230(GenCounter) :
             IP (str) : Device ip address
             name (str) : An identifier for the device
             logger (logging)
+            serial (dict) : Settings of the serial port for Interfaces.usb_acm
+                            (Gen_serial args: baudrate, flow)
         '''
         self._port = port
         self._conn = interface
@@ -77,11 +91,7 @@ class KS53230(GenCounter) :
         self.logger = logger
         self._savedTrigCfg = None
         self._savedTrigLev = None
-        if self._conn != Interfaces.vxi11:
-            logger.error("By now %s is not supported." % str(interface))
-            raise NotImplementedError("Only vxi11 connection is supported.")
-
-        self._drv = KS53230_drv(self._port)
+        self._drv = KS53230_drv(self._port, transport=openTransport(interface, port, **(serial or {})))
 
     def open(self) :
         '''
@@ -99,7 +109,7 @@ class KS53230(GenCounter) :
         Method to close the connection with the device
         '''
         self.logger.info("Connection closed with %s" % self._drv.deviceInfo())
-        self._drv.inst.close()
+        self._drv.close()
     
 
     def resetDevice(self) :
@@ -112,12 +122,75 @@ class KS53230(GenCounter) :
         self.logger.info("Device reset")
         self._drv.write("*RST")
 
+    def endConfig(self) :
+        '''
+        Method to synchronise with the device at the end of a configuration block
+
+        Writes to the device are pipelined, so this waits until all of them
+        were completed. If check_errors is set, the error queue is drained
+        and the errors are logged.
+
+        Returns:
+            A list with the errors reported by the device.
+        '''
+        if not self.check_errors :
+            self._drv.sync()
+            return []
+        errs = self._drv.errors()
+        for e in errs :
+            self.logger.warning("Device error: %s" % e)
+        return errs
+
+    async def endConfigAsync(self) :
+        '''
+        Coroutine version of endConfig
+        '''
+        if not self.check_errors :
+            await self._drv.syncAsync()
+            return []
+        errs = await self._drv.errorsAsync()
+        for e in errs :
+            self.logger.warning("Device error: %s" % e)
+        return errs
+
+    def binaryFormat(self) :
+        '''
+        Method to make the device return the readings as binary blocks
+
+        The readings are sent as IEEE 488.2 definite length blocks of
+        64 bits floats in little-endian order, see fetchBlock.
+        '''
+        with self._drv.batch() :
+            self._drv.write("FORM:DATA REAL,64")
+            self._drv.write("FORM:BORD SWAP")
+
+    def fetchBlock(self, cmd) :
+        '''
+        Method to send a query that returns readings in binary format
+
+        Args:
+            cmd (str) : A query returning readings (READ?, FETC?, R?, ...)
+
+        Returns:
+            An array('d') with the readings.
+        '''
+        return parseBlock(self._drv.queryRaw(cmd), little=True)
+
+    async def fetchBlockAsync(self, cmd) :
+        '''
+        Coroutine version of fetchBlock
+        '''
+        return parseBlock(await self._drv.queryRawAsync(cmd), little=True)
+
     def trigLevel(self, cfgstr) :
         '''
         Method to set the trigger mode and level for a specified channel.
 
+        The configuration is kept, so it's applied again after the
+        measurement configurations that reset it (see freq).
+
         Args:
-            cfgstr (str) : A string containing valid params
+            cfgstr (str or TrigLevelConfig) : A string containing valid params
 
         The expected params in this method are:
             trig<ch>:<value> Where ch is the channel index in the counter and value could be:
@@ -125,29 +198,24 @@ class KS53230(GenCounter) :
                 - a<%> The key "a" (auto) followed by a percentage, i.e. a50 for mode auto at 50% of the amplitude for the signal.
 
         '''
-        cfgdict = self.parseConfig(cfgstr)
-        self.logger.debug("Config parsed: %s" % (str(cfgdict)))
-        keys = " ".join(cfgdict.keys())
-        keys = re.findall(r"(trig\d)", keys)
-        if keys == [] :
+        cfg = TrigLevelConfig.parse(cfgstr)
+        self.logger.debug("Config parsed: %s" % (str(cfg)))
+        if cfg.levels == () :
             raise AttributeError("No valid params passed to trigLevel")
-
-        for k in keys :
-            # First, detect if the trigger mode is auto or manual
-            cur_t = cfgdict[k]
-            # Mode auto
-            if cur_t[0] == "a":
-                percent = cur_t[-2:]
-                self.logger.debug("Mode auto for channel %s at %s\%" % (k[-1], str(percent)))
-            # Mode manual
-            else:
-                volts = float(cur_t)
-                #TODO: channel number
-                self.logger.debug("Mode manual for channel %s at %fV" % (k[-1], volts))
-            self._drv.write("INPUT%d:LEVEL:AUTO OFF" % int(k[-1]))
-            self._drv.write("INPUT%d:LEVEL %1.3f" % (int(k[-1]), float(cfgdict[k])) )
-            self.logger.debug("Setting Trigger Level in channel %d to %1.3f"
-                          % (int(k[-1]), float(cfgdict[k])) )
+        self._savedTrigLev = cfg
+
+        with self._drv.batch() :
+            for lvl in cfg.levels :
+                # Mode auto
+                if lvl.volts is None :
+                    self.logger.debug("Mode auto for channel %d at %d%%" % (lvl.ch, lvl.auto))
+                    self._drv.write("INPUT%d:LEVEL:RELATIVE %d" % (lvl.ch, lvl.auto))
+                    self._drv.write("INPUT%d:LEVEL:AUTO ON" % lvl.ch)
+                # Mode manual
+                else :
+                    self.logger.debug("Mode manual for channel %d at %fV" % (lvl.ch, lvl.volts))
+                    self._drv.write("INPUT%d:LEVEL:AUTO OFF" % lvl.ch)
+                    self._drv.write("INPUT%d:LEVEL %1.3f" % (lvl.ch, lvl.volts))
 
     def freq(self, cfgstr, meas_out, breakread=False) :
         '''
@@ -156,7 +224,7 @@ class KS53230(GenCounter) :
         The trigger must be configured before calling this method.
 
         Args:
-            cfgstr (str) : A string containing valid params
+            cfgstr (str or FreqConfig) : A string containing valid params
             meas_out (MeasuredData) : Data container
             breakread (Boolean) : Enable fetching data before taking the N samples.
 
@@ -170,9 +238,9 @@ class KS53230(GenCounter) :
         Raises:
             Exception when trigger is not configured
         '''
-        self.freq_rawcfg = cfgstr
-        cfgdict = self.parseConfig(cfgstr)
-        self.logger.debug("Config parsed: %s" % (str(cfgdict)))
+        cfg = FreqConfig.parse(cfgstr)
+        self.freq_rawcfg = cfg
+        self.logger.debug("Config parsed: %s" % (str(cfg)))
 
         # Check that trigger was previously configured
         if self._savedTrigCfg is None:
@@ -180,91 +248,147 @@ class KS53230(GenCounter) :
             raise Exception("Please configure the trigger system before calling this method.")
 
         # After seting the measure config, the trigger must be configured again
-        exp = str(cfgdict['exp']) if  cfgdict['exp'] else "DEF"
-        res = "1e-%s" % cfgdict['res'] if  cfgdict['res'] else "DEF"
-        self._drv.write("CONF:FREQ %s,%s,(@%s)" % (exp,res,cfgdict['ch']))
-        # 1 sample per trigger
-        self._drv.write("SAMP:COUN 1")
-        samples = int(cfgdict['sampl']) if cfgdict['sampl'] else 1
-        # How many triggers accept
-        self._drv.write("TRIG:COUN %d" % samples)
-        self.configureTrigger(self._savedTrigCfg)
-        if self._savedTrigLev is not None: self.trigLevel(self._savedTrigLev)
-        self._drv.write("INPUT%s:COUPLING %s" % (cfgdict['ch'],str(cfgdict["cou"])))
-        self._drv.write("SENS:FREQ:GATE:TIME .1")
+        exp = cfg.expected or "DEF"
+        res = "1e-%d" % cfg.resolution if cfg.resolution else "DEF"
+        samples = cfg.samples
+        with self._drv.batch() :
+            self._drv.write("CONF:FREQ %s,%s,(@%d)" % (exp, res, cfg.ch))
+            # 1 sample per trigger
+            self._drv.write("SAMP:COUN 1")
+            # How many triggers accept
+            self._drv.write("TRIG:COUN %d" % samples)
+            # The saved configurations are already parsed
+            self.configureTrigger(self._savedTrigCfg)
+            if self._savedTrigLev is not None: self.trigLevel(self._savedTrigLev)
+            self._drv.write("INPUT%d:COUPLING %s" % (cfg.ch, cfg.coupling))
+            self._drv.write("SENS:FREQ:GATE:TIME .1")
+            self.binaryFormat()
+        self.endConfig()
         self.logger.info("Taking %d samples of expected freq. at %s Hz" % (samples, exp))
         
         # All configured, now start the measurement
-        self._drv.write("INIT")
-        # and wait until all the measurements were taken...
         if not breakread or samples == 1:
-            ok = int(self._drv.query("*ESR?"))
-            while ok & 0x1:
-                time.sleep(1)
-                int(ok = self._drv.query("*ESR?"))
-            meas = self._drv.query("FETC?")
-            self.logger.debug("%d samples:\n$s" % (samples, meas))
-            #TODO: Improve measurement addition
-            for m in meas.split(","):
-                meas_out.addMeasures(float(m))
-        else:
-            # Wait enough for some fresh samples
-            time.sleep(self.deadtime)
-            # When reading with R? you can't trust that N samples
-            # will be readen each time
-            #for i in range(1, samples,self.step):
-            i = 0
-            while i < samples:
-                readvalues = 0
-                meas = self._drv.query("R? %d" % self.step)
-                # Ignore first characters, see page 26 of the 
-                # 53230A Programmer's Reference
-                k = 0
-                while meas[k] != "+":
-                    k+=1
-                meas = meas[k:]
-                for m in meas.split(","):
-                    meas_out.addMeasures(float(m))
-                    readvalues +=1
-                if readvalues > 0:
-                    self.logger.debug("%d most recent samples:\n\t%s" % (readvalues, meas))
+            # Clear the OPC bit left by a previous measurement
+            self._drv.write("*CLS")
+            self._drv.write("INIT")
+            # and wait until all the measurements were taken...
+            self._drv.write("*OPC")
+            while not int(self._drv.query("*ESR?")) & 0x1:
                 time.sleep(self.deadtime)
-                i+=readvalues
+            meas = self.fetchBlock("FETC?")
+            self.logger.debug("%d samples fetched" % len(meas))
+            meas_out.addMeasures(meas)
+        else:
+            # Fetch the readings while the device is measuring
+            self.streamReadings(samples, meas_out)
+
+    def streamReadings(self, samples, meas_out) :
+        '''
+        Method to start a measurement and stream the readings to meas_out
+        (blocking version of streamReadingsAsync)
+        '''
+        return runSync(self.streamReadingsAsync(samples, meas_out))
+
+    async def streamReadingsAsync(self, samples, meas_out) :
+        '''
+        Coroutine to start a measurement and stream the readings to meas_out
+
+        The device keeps measuring into its reading memory while the readings
+        taken so far are moved to meas_out: DATA:POIN? tells how many readings
+        are available and DATA:REM? fetches exactly those ones. The polling
+        period adapts to the observed rate, aiming at "chunk" readings in each
+        fetch. When the device completes a measurement and more samples are
+        needed (or in infinite mode), it is initiated again.
+
+        The measurement must be configured before calling this method.
+
+        Args:
+            samples (int) : The number of samples to be taken (-1 for infinite mode)
+            meas_out (MeasuredData) : Data container
+        '''
+        taken = 0
+        wait = self.deadtime
+        rate = None
+        done = False
+        async with self._measuring() :
+            # Clear the OPC bit left by a previous run, reading *ESR? clears
+            # it for the next INIT
+            await self._drv.writeAsync("*CLS")
+            await self._drv.writeAsync("INIT")
+            # *OPC sets the bit 0 of ESR when the measurement is completed
+            await self._drv.writeAsync("*OPC")
+            last = time.time()
+
+            while samples < 0 or taken < samples:
+                avail = int(await self._drv.queryAsync("DATA:POIN?"))
+                if avail > 0:
+                    meas = await self.fetchBlockAsync("DATA:REM? %d" % avail)
+                    if samples >= 0:
+                        meas = meas[:samples - taken]
+                    meas_out.addMeasures(meas)
+                    taken += len(meas)
+                    self.logger.debug("%d readings streamed" % len(meas))
+                elif done:
+                    # All the readings of the last measurement were fetched
+                    done = False
+                    await self._drv.writeAsync("INIT")
+                    await self._drv.writeAsync("*OPC")
+                    continue
+                else:
+                    done = bool(int(await self._drv.queryAsync("*ESR?")) & 0x1)
+                    if done:
+                        # Take the readings that arrived in the meantime
+                        continue
+
+                # Adapt the polling period to the rate of the readings
+                now = time.time()
+                cur_rate = avail / max(now - last, 1e-6)
+                rate = cur_rate if rate is None else 0.5 * (rate + cur_rate)
+                last = now
+                if rate > 0:
+                    wait = min(max(self.chunk / rate, self.min_poll), self.deadtime)
+                else:
+                    wait = self.deadtime
+                if samples < 0 or taken < samples:
+                    await asyncio.sleep(wait)
+
+            # Don't leave the device measuring
+            await self._drv.writeAsync("ABOR")
 
     def period(self, cfgstr) :
         '''
         Method to measure the period of the input signal in a channel
 
         Args:
-            cfgstr (str) : A string containing valid params
+            cfgstr (str or PeriodConfig) : A string containing valid params
 
         The expected params in this method are:
             ch (int) : Index of the channel, (ch1:1, ch2:2 or ch1:1 ch2:2)
         '''
-        self.period_rawcfg = cfgstr
-        cfgdict = self.parseConfig(cfgstr)
-        self.logger.debug("Config parsed: %s" % (str(cfgdict)))
-        keys = " ".join(cfgdict.keys())
-        keys = re.findall(r"(ch\d)", keys)
-        if keys == [] :
+        cfg = PeriodConfig.parse(cfgstr)
+        self.period_rawcfg = cfg
+        self.logger.debug("Config parsed: %s" % (str(cfg)))
+        if cfg.channels == () :
             raise Exception("No valid params passed to period")
 
-        for k in keys :
-            self._drv.write("CONF:PER DEF,DEF,(@%d)" % int(k[-1]))
-            self.trigLevel(cfgstr)
-            self._drv.write("INPUT%d:COUPLING DC" % int(k[-1]))
+        for ch in cfg.channels :
+            with self._drv.batch() :
+                self._drv.write("CONF:PER DEF,DEF,(@%d)" % ch)
+                self.trigLevel(cfg.levels)
+                self._drv.write("INPUT%d:COUPLING DC" % ch)
+                self.binaryFormat()
+            self.endConfig()
             self._drv.write("INIT")
             time.sleep(3)
-            print(self._drv.query("READ?"))
-            logging.debug("Measuring Period in channel %d"
-                          % (int(k[-1])))
+            print(self.fetchBlock("READ?"))
+            self.logger.debug("Measuring Period in channel %d" % ch)
 
     def configureTrigger(self, cfgstr) :
         '''
         Method to configure common settings for the trigger system.
 
         Args:
-            cfgstr (str) : A string containing valid params
+            cfgstr (str or TriggerConfig) : A string containing valid params
 
         The expected params in this method are:
             cnt (int) : Number of triggers that will be accepted by the instrument before returning to idle state.
@@ -279,43 +403,66 @@ class KS53230(GenCounter) :
         Raises:
             AttributeError when an invalid value was passed as argument.
         '''
-        cfgdict = self.parseConfig(cfgstr)
-        self._savedTrigCfg = cfgstr
-        self.logger.debug("Config parsed: %s" % (str(cfgdict)))
-        if "cnt" in cfgdict:
-            count = int(cfgdict["cnt"])
-            if count < 1 or count > 1000000:
-                msg = "Trigger Count out of limits (%d)" % count
-                raise AttributeError(msg)
-            self._drv.write("TRIGGer:COUNt %d" % int(count))
-        if "del" in cfgdict:
-            delay = int(cfgdict["del"])
-            if delay < 0 or delay > 3600:
-                msg = "Trigger delay out of limits (%d)" % delay
-                raise AttributeError(msg)
-            delay = ("%.6f" % delay)
-            self._drv.write("TRIGGer:DELay %s" % delay)
-        if "sou" in cfgdict:
-            source = cfgdict["sou"]
-            valid_src = ['imm', 'bus', 'ext']
-            if source not in valid_src:
-                msg = "Trigger source not valid (%s)" % source
-                raise AttributeError(msg)
-            self._drv.write("TRIGGer:SOURce %s" % source)
-        if "slo" in cfgdict:
-            slope = cfgdict["slo"]
-            valid_slope = ['pos', 'neg']
-            if slope not in valid_slope:
-                msg = "Trigger slope not valid (%s)" % slope
-                raise AttributeError(msg)
-            self._drv.write("TRIGGer:SLOPe %s" % slope)
-
-    def timeInterval(self, cfgstr, meas_out) :
-        '''
-        Method to measure Time Interval between the input channels
+        cfg = TriggerConfig.parse(cfgstr)
+        self._savedTrigCfg = cfg
+        self.logger.debug("Config parsed: %s" % (str(cfg)))
+        with self._drv.batch() :
+            if cfg.count is not None:
+                self._drv.write("TRIGGer:COUNt %d" % cfg.count)
+            if cfg.delay is not None:
+                self._drv.write("TRIGGer:DELay %.6f" % cfg.delay)
+            if cfg.source is not None:
+                self._drv.write("TRIGGer:SOURce %s" % cfg.source)
+            if cfg.slope is not None:
+                self._drv.write("TRIGGer:SLOPe %s" % cfg.slope)
+
+    def _timeIntervalSetup(self, cfg) :
+        '''
+        Write the settings of a time interval measurement (TimeIntervalConfig)
+        '''
+        self.logger.debug("Config parsed: %s" % (str(cfg)))
+        if cfg.coupling is None or cfg.impedance is None :
+            raise AttributeError("The coupling and the impedance must be specified")
+        # Specify the type of measurement to be done
+        self._drv.write("CONFIGURE:TINTERVAL (@%d),(@%d)" % (cfg.ref_chan,
+                        cfg.other_chan))
+
+        # The last command overwrites trigger configuration :-(
+        self._drv.write("INPUT1:COUPLING %s" % cfg.coupling)
+        self._drv.write("INPUT2:COUPLING %s" % cfg.coupling)
+        self._drv.write("INPUT1:IMPedance %f" % cfg.impedance)
+        self._drv.write("INPUT2:IMPedance %f" % cfg.impedance)
+        self.trigLevel(cfg.levels)
+
+        # It seems that specify the number of samples here doesn't work properly
+        self._drv.write("TRIG:COUNT 1")
+        if not cfg.tstamp:
+            # All the samples are taken after a single trigger
+            samples = cfg.samples
+            run = self.max_readings if samples < 0 else min(samples, self.max_readings)
+            self._drv.write("SAMP:COUNT %d" % run)
+        self.binaryFormat()
+
+    def configureTimeInterval(self, cfgstr) :
+        '''
+        Method to apply the settings of a time interval measurement without
+        measuring, i.e. the setup of warmStart (see timeIntervalAsync)
+
+        Args:
+            cfgstr (str or TimeIntervalConfig) : A string containing valid params
+        '''
+        with self._drv.batch() :
+            self._timeIntervalSetup(TimeIntervalConfig.parse(cfgstr))
+        self.endConfig()
+
+    async def timeIntervalAsync(self, cfgstr, meas_out, start=None) :
+        '''
+        Coroutine to measure Time Interval between the input channels
 
         Args:
-            cfgstr (str) : A string containing valid params
+            cfgstr (str or TimeIntervalConfig) : A string containing valid params
+            meas_out (MeasuredData) : Data container
+            start (coroutine function) : Awaited before arming the device
 
         The expected params in this method are:
             ref (int) : The channel used as reference
@@ -326,43 +473,44 @@ class KS53230(GenCounter) :
             coup (str) : coupling ac or dc, (coup:dc)
             imp (int or str) : impedance range 50 - 1000000, (imp:1000000)
         '''
-        cfgdict = self.parseConfig(cfgstr)
-        logging.debug("Config parsed: %s" % (str(cfgdict)))
-        # Repasar la configuración parseada
-        ref_chan, other_chan = (1,2) if cfgdict["ref"] == "A" else (2,1)
-        samples = int(cfgdict["sampl"])
+        cfg = TimeIntervalConfig.parse(cfgstr)
+        samples = cfg.samples
+        tstamp = cfg.tstamp
+        # Drop the outliers before storing the samples (if enabled)
+        meas_out = self.filterOutput(meas_out)
 
         # Measurement configuration --------------------------------------------
-        # Specify the type of measurement to be done
-        self._drv.write("CONFIGURE:TINTERVAL (@%d),(@%d)" % (ref_chan,
-                        other_chan))
-
-        # The last command overwrites trigger configuration :-(
-        self._drv.write("INPUT1:COUPLING %s" % str(cfgdict["coup"]))
-        self._drv.write("INPUT2:COUPLING %s" % str(cfgdict["coup"]))
-        self._drv.write("INPUT1:IMPedance %f" % float(cfgdict["imp"]))
-        self._drv.write("INPUT2:IMPedance %f" % float(cfgdict["imp"]))
-        self.trigLevel(cfgstr)
-
-        # It seems that specify the number of samples here doesn't work properly
-        self._drv.write("TRIG:COUNT 1")
+        # All the settings are sent in one or two messages
+        async with self._drv.batch() :
+            self._timeIntervalSetup(cfg)
+        await self.endConfigAsync()
 
         # Taking measures from the instrument ----------------------------------
-        ret =  []
-        self._drv.write("INIT")
-
-        k = 0
-        while k < samples:
-            # Enable the trigger for a new measure, and wait until a PPS pulse
-            # arrives at ref channel. No timeout need by the control software.
-
-            # Do you want time stamps?
-            if 'tstamp' in cfgstr and cfgdict["tstamp"] == "Y" :
-                timestamp = time.localtime()
-                timest = time.strftime(format("%H%M%S"),timestamp)+"\n"
-            cur = self._drv.query("READ?")
-            if 'tstamp' in cfgstr and cfgdict["tstamp"] == "Y" :
-                meas_out.addMeasures(int(timest), float(cur))
-            else:
-                meas_out.addMeasures(float(cur))
-            k += 1
+        if start is not None:
+            await start()
+        if not tstamp:
+            # Stream from the reading memory, the device doesn't stop measuring
+            await self.streamReadingsAsync(samples, meas_out)
+            return
+
+        # Host timestamps need a READ? for each sample. Enable the trigger for
+        # a new measure, and wait until a PPS pulse arrives at ref channel.
+        # No timeout need by the control software.
+        async with self._measuring() :
+            await self._drv.writeAsync("INIT")
+            # With a raw socket the next READ? is sent before reading the answer
+            # of the current one, so the device starts it without a round trip.
+            # Each sample is timestamped when the device starts its READ?, that
+            # is, when the answer of the previous one arrives.
+            pending = 0
+            k = 0
+            timest = int(time.strftime("%H%M%S"))
+            while samples < 0 or k < samples:
+                while pending < self._drv.pipeline and (samples < 0 or k + pending < samples):
+                    self._drv.postQuery("READ?")
+                    pending += 1
+                cur = parseBlock(await self._drv.fetchRawAsync(), little=True)[0]
+                pending -= 1
+                meas_out.addMeasures(cur, timest)
+                timest = int(time.strftime("%H%M%S"))
+                k += 1
@@ -27,84 +27,104 @@ Driver for the KEYSIGHT 53230A Universal Frequency Counter/Timer
 #-------------------------------------------------------------------------------
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
-# Import system modules
+# User modules
+from driver.gen_drv import Gen_drv
+from driver.transport import Interfaces, openTransport
 
-import time
-import vxi11
-
-class KS53230_drv() :
+class KS53230_drv(Gen_drv) :
     '''
     KEYSIGHT 53230A driver.
+
+    Writes are pipelined: they return as soon as the command is sent, and the
+    instrument executes them in order. Use sync() or wait() only where the
+    host must know that the previous commands were completed.
     '''
 
-    def __init__(self, Device) :
+    ## Fixed delay (s) after each write, None for pipelined writes
+    delay = None
+    ## Size (bytes) of the input buffer of the instrument
+    input_buffer = 1024
+
+    def __init__(self, Device, delay=None, shadow=True, raw=False, pipeline=8, serial=None,
+                 transport=None) :
         '''
         Constructor
 
         Args:
-            Device (ip) : device ip address
+            Device (ip) : device ip address ("ip:port" for a raw socket)
+            delay (float) : Fallback delay (s) after each write. Default : None.
+            shadow (boolean) : Don't send the settings already applied (see StateCache)
+            raw (boolean) : Use the raw SCPI socket (port 5025) instead of vxi11
+            pipeline (int) : Max. pending queries (see postQuery), only for
+                             the raw socket
+            serial (dict) : Use the serial port Device (index of /dev/ttyACM
+                            or a device file) with these Gen_serial args
+                            (baudrate, flow) instead of the network
+            transport (Transport) : An open transport, Device is ignored
         '''
-        self.inst = vxi11.Instrument(Device)
-
-        info = self.query("*IDN?")
-        self.manufacturer = info.split(",")[0]
-        self.device = info.split(",")[1]
-        self.serial = info.split(",")[2]
+        if transport is None :
+            if serial is not None :
+                transport = openTransport(Interfaces.usb_acm, Device, **serial)
+            elif raw :
+                transport = openTransport(Interfaces.socket, Device, pipeline=pipeline)
+            else :
+                transport = openTransport(Interfaces.vxi11, Device)
+        Gen_drv.__init__(self, transport, delay, shadow)
 
     # ------------------------------------------------------------------------ #
 
-    def deviceInfo(self) :
+    def sync(self) :
         '''
-        Method to retrieve device information.
-
-        Returns:
-            A string with manufacturer, device name and serial number.
-        '''   
-        return ("%s %s (s/n : %s)" % (self.manufacturer, self.device, self.serial))
-
-    # ------------------------------------------------------------------------ #
-
-    def query(self, cmd, length=100) :
+        Method to block until all the pending commands are completed (*OPC?).
         '''
-        Method to write a command and read the result.
-
-        Args:
-            cmd (str) :  A SCPI valid command for the device.
-            length (int) : Length of the input read. Default : 100.
+        self.query("*OPC?")
 
-        Returns:
-            Command "cmd" response.
+    async def syncAsync(self) :
+        '''
+        Coroutine version of sync
         '''
-        return self.inst.ask(cmd)
-       
+        await self.queryAsync("*OPC?")
+
     # ------------------------------------------------------------------------ #
 
-    def read(self, length=1) :
+    def wait(self) :
         '''
-        Method to read from output buffer of the instrument
-
-        Args:
-            length (int) : Number of bytes to read. Default : 1.
+        Method to make the instrument complete the pending commands before
+        executing the next ones (*WAI). It doesn't block the host.
         '''
-        return self.inst.read()
+        self.write("*WAI")
 
     # ------------------------------------------------------------------------ #
 
-    def write(self, cmd, check=False) :
+    def errors(self) :
         '''
-        Method for writing to input buffer of the instrument.
+        Method to drain the error queue of the instrument.
 
-        Args:
-            cmd (str) : A SCPI valid command for the device.
-            check (boolean) : When true the driver will ask for errors in previous command.
+        As a query, it also waits until the previous commands are completed.
 
         Returns:
-            If check=True it returns a tuple (error code,error message).
+            A list with the error strings, empty if there was no error.
         '''
-        self.inst.write(cmd)
-        time.sleep(1)
-
-        if check :
-            return self.inst.query("syst:err?")
-
-
+        errs = []
+        err = self.query("SYST:ERR?")
+        # The instrument answers +0,"No error" when the queue is empty
+        while int(err.split(",")[0]) != 0 :
+            errs.append(err)
+            err = self.query("SYST:ERR?")
+        # A rejected setting leaves the shadow state wrong
+        if errs :
+            self.resync()
+        return errs
+
+    async def errorsAsync(self) :
+        '''
+        Coroutine version of errors
+        '''
+        errs = []
+        err = await self.queryAsync("SYST:ERR?")
+        while int(err.split(",")[0]) != 0 :
+            errs.append(err)
+            err = await self.queryAsync("SYST:ERR?")
+        if errs :
+            self.resync()
+        return errs
@@ -0,0 +1,351 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Common helpers for the SCPI instrument drivers.
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup measurement
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import sys
+from array import array
+
+def parseBlock(data, little=False) :
+    '''
+    Decode an IEEE 488.2 block of REAL,64 values.
+
+    Both definite length (#<n><length><data>) and indefinite length
+    (#0<data>, ended by the message terminator) blocks are supported. The
+    payload is copied once into the output array, no per-sample conversion
+    is done in Python.
+
+    Args:
+        data (bytes) : The raw answer from the instrument
+        little (boolean) : True if the values are little-endian (FORM:BORD SWAP)
+
+    Returns:
+        An array('d') with the values.
+
+    Raises:
+        ValueError if data isn't a valid block.
+    '''
+    mv = memoryview(data)
+    start = 0
+    # Skip leading white spaces
+    while start < len(mv) and mv[start] in b" \t\r\n" :
+        start += 1
+    if len(mv) - start < 2 or mv[start] != ord("#") :
+        raise ValueError("Not an IEEE 488.2 block")
+    ndigits = mv[start + 1] - ord("0")
+    if ndigits < 0 or ndigits > 9 :
+        raise ValueError("Bad block header")
+
+    if ndigits == 0 :
+        payload = mv[start + 2:]
+        # The indefinite length block ends with the message terminator
+        if len(payload) % 8 and bytes(payload[-1:]) == b"\n" :
+            payload = payload[:-1]
+    else :
+        first = start + 2 + ndigits
+        length = int(bytes(mv[start + 2:first]))
+        payload = mv[first:first + length]
+        if len(payload) != length :
+            raise ValueError("Truncated block (%d of %d bytes)" % (len(payload), length))
+
+    if len(payload) % 8 :
+        raise ValueError("Block length (%d) is not a multiple of 8" % len(payload))
+    values = array("d")
+    values.frombytes(payload)
+    if little != (sys.byteorder == "little") :
+        values.byteswap()
+    return values
+
+def messageEnd(buf, count, term=0x0A, start=0) :
+    '''
+    Find the end of the first response message in a buffer.
+
+    A response ends with the terminator. If it's a definite length block
+    (#<n><length><data>), the terminator after the data is the end, even
+    if the data contains terminator bytes.
+
+    Args:
+        buf (bytearray) : The bytes received so far
+        count (int) : Number of valid bytes in buf
+        term (int) : The terminator byte
+        start (int) : Offset of the message in buf
+
+    Returns:
+        The offset after the message (terminator included), or None if
+        it's not complete yet.
+    '''
+    if count - start < 2 :
+        return start + 1 if count > start and buf[start] == term else None
+    if buf[start] == 0x23 and 0x31 <= buf[start + 1] <= 0x39 :
+        first = start + 2 + buf[start + 1] - 0x30
+        if count < first :
+            return None
+        # Terminator bytes inside the data don't end the message
+        start = first + int(bytes(buf[start + 2:first]))
+        if count <= start :
+            return None
+    end = buf.find(term, start, count)
+    return None if end < 0 else end + 1
+
+def joinCommands(cmds, maxlen) :
+    '''
+    Join several SCPI commands in as few messages as possible.
+
+    Each command is separated from the previous one by ";:" so the command
+    tree is reset to the root before parsing it. Common commands (*XXX) are
+    only separated by ";". A message never exceeds maxlen bytes unless a
+    single command is longer than that.
+
+    Args:
+        cmds (list) : A list with SCPI commands (str)
+        maxlen (int) : Max. length of each message
+
+    Returns:
+        A list with the messages to be sent.
+    '''
+    msgs = []
+    cur = ""
+    for cmd in cmds :
+        cmd = cmd.strip()
+        if cmd == "" : continue
+        if cur == "" :
+            cur = cmd
+            continue
+        sep = ";" if cmd[0] in "*:" else ";:"
+        if len(cur) + len(sep) + len(cmd) > maxlen :
+            msgs.append(cur)
+            cur = cmd
+        else :
+            cur = cur + sep + cmd
+    if cur != "" :
+        msgs.append(cur)
+    return msgs
+
+class CommandBatch() :
+    '''
+    Context manager to coalesce the commands written to a driver.
+
+    While the context is active, the commands passed to the write method of
+    the driver are collected instead of being sent. When the outermost
+    context ends, they are joined (see joinCommands) and sent in as few
+    messages as the input buffer of the instrument allows. If an exception
+    is raised inside the context, the collected commands are discarded.
+
+    The driver must have a _batch attribute (None when not batching) and
+    a _flushBatch(cmds) method (_flushBatchAsync for "async with").
+    '''
+
+    def __init__(self, drv) :
+        '''
+        Constructor
+
+        Args:
+            drv : The driver whose commands will be collected
+        '''
+        self._drv = drv
+        self._outer = False
+
+    def __enter__(self) :
+        if self._drv._batch is None :
+            self._drv._batch = []
+            self._outer = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) :
+        if not self._outer :
+            return False
+        cmds = self._drv._batch
+        self._drv._batch = None
+        if exc_type is None :
+            self._drv._flushBatch(cmds)
+        elif getattr(self._drv, "state", None) is not None :
+            # The shadow state already took the discarded commands
+            self._drv.state.invalidate()
+        return False
+
+    # The same context in coroutines ("async with"), the commands are sent
+    # with the _flushBatchAsync method of the driver
+    async def __aenter__(self) :
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) :
+        if self._outer and exc_type is None :
+            cmds = self._drv._batch
+            self._drv._batch = None
+            await self._drv._flushBatchAsync(cmds)
+            return False
+        return self.__exit__(exc_type, exc_value, traceback)
+
+def shortForm(header) :
+    '''
+    Get the canonical short form of a SCPI command header.
+
+    Each node is reduced to its short form (the first 4 letters, or 3 if
+    the 4th one is a vowel) and a numeric suffix 1 is dropped, as it is
+    the default. i.e. "INPUT1:LEVEL" and ":INP:LEV" give "INP:LEV".
+
+    Args:
+        header (str) : The header of a command (without parameters)
+
+    Returns:
+        The short form in upper case.
+    '''
+    header = header.strip().lstrip(":").upper()
+    query = header.endswith("?")
+    nodes = []
+    for node in header.rstrip("?").split(":") :
+        name = node.rstrip("0123456789")
+        suffix = node[len(name):]
+        if len(name) > 4 :
+            name = name[:3] if name[3] in "AEIOU" else name[:4]
+        if suffix == "1" :
+            suffix = ""
+        nodes.append(name + suffix)
+    return ":".join(nodes) + ("?" if query else "")
+
+class StateCache() :
+    '''
+    Shadow copy of the settings of an instrument.
+
+    The drivers pass each command through update before sending it. A
+    setting (header and parameters) that matches the known state of the
+    instrument doesn't need to be sent. The known state is forgotten when
+    the instrument resets its settings: *RST, *RCL, SYST:PRES, a MEAS
+    query or a CONF command for a different measurement. Queries, common
+    commands and commands without parameters are always sent.
+    '''
+
+    ## Roots of the headers whose settings are tracked
+    tracked = ("CONF", "INP", "TRIG", "ARM", "SAMP", "SENS", "FORM", "INIT:CONT")
+    ## Commands that reset the settings
+    resets = ("*RST", "*RCL", "SYST:PRES", "MEAS")
+    ## Settings that make the instrument change the value of their parent node
+    auto = ":AUTO"
+    ## Parameters that stand for a value of the instrument, its query
+    ## answers the value instead (i.e. INP:IMP MAX gives 1E6)
+    symbolic = ("MIN", "MAX", "DEF")
+
+    def __init__(self) :
+        self._state = {}
+
+    def invalidate(self) :
+        '''
+        Forget the known state (i.e. after changes from the front panel)
+        '''
+        self._state.clear()
+
+    @staticmethod
+    def canonical(params) :
+        '''
+        Canonical form of the parameters of a command, or of the answer to
+        its query: numbers in %g format, ON/OFF as 1/0 and the short form
+        of the other words, i.e. "1.500" and "+1.5E+00" give "1.5".
+        '''
+        vals = []
+        for p in params.split(",") :
+            p = p.strip().strip('"').upper()
+            try :
+                p = "%.15g" % float(p)
+            except ValueError :
+                if p in ("ON", "OFF") :
+                    p = "1" if p == "ON" else "0"
+                elif p.isalpha() :
+                    p = shortForm(p)
+            vals.append(p)
+        return ",".join(vals)
+
+    def snapshot(self) :
+        '''
+        Method to get the known settings
+
+        Returns:
+            A list of [header, parameters] in the order they must be applied.
+        '''
+        return [list(v) if k == "CONF" else [k, v] for k, v in self._state.items()]
+
+    def load(self, settings) :
+        '''
+        Method to set the known settings (i.e. after recalling a setup)
+
+        Args:
+            settings (list) : A list returned by snapshot
+        '''
+        self._state.clear()
+        for key, value in settings :
+            if key.startswith("CONF") :
+                self._state["CONF"] = (key, value)
+            else :
+                self._state[key] = value
+
+    def update(self, cmd) :
+        '''
+        Method to check a message against the known state and update it
+
+        Args:
+            cmd (str) : The message to be sent (one or several commands)
+
+        Returns:
+            False if the message is a single setting that is already
+            applied, so it doesn't need to be sent.
+        '''
+        parts = [c for c in cmd.split(";") if c.strip() != ""]
+        needed = len(parts) != 1
+        # A header after ";" without ":" is relative to the node of the
+        # previous command, i.e. "INP1:COUP AC;IMP 50" sets INP1:IMP
+        path = ""
+        for part in parts :
+            header, _, params = part.strip().partition(" ")
+            if not header.startswith("*") :
+                if path != "" and not header.startswith(":") :
+                    header = path + ":" + header
+                path = header.lstrip(":").rpartition(":")[0]
+            key = shortForm(header)
+            if key.startswith(self.resets) :
+                self.invalidate()
+                needed = True
+                continue
+            if params.strip() == "" or key.endswith("?") or \
+               key.startswith("*") or not key.startswith(self.tracked) :
+                needed = True
+                continue
+            value = self.canonical(params)
+            if key.startswith("CONF") :
+                # A new measurement resets the inputs and the trigger system
+                if self._state.get("CONF") == (key, value) :
+                    continue
+                self.invalidate()
+                self._state["CONF"] = (key, value)
+                needed = True
+                continue
+            if self._state.get(key) != value :
+                if key.endswith(self.auto) :
+                    # i.e. the level chosen by LEVEL:AUTO ON is unknown
+                    self._state.pop(key[:-len(self.auto)], None)
+                self._state[key] = value
+                needed = True
+        return needed
@@ -0,0 +1,555 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Transport of the SCPI messages between the host and the instruments.
+
+Transport implements the buffered reception of the answers for every
+interface: the bytes are read into a reusable buffer and split in messages
+(scpi.messageEnd), the timeouts are applied to each read, and queries can
+be pipelined (several queries sent before reading their answers) where the
+interface allows it. The reads are also available as coroutines (the
+"Async" methods), so one event loop can drive many instruments. The
+subclasses only move bytes:
+ - Gen_usbtmc : usbtmc kernel driver (/dev/usbtmc<n>)
+ - Gen_serial : Serial port, i.e. USB CDC-ACM (/dev/ttyACM<n>)
+ - Gen_socket : Raw SCPI socket (port 5025)
+ - Gen_vxi11 : vxi11 (python-vxi11), the RPC layer frames the messages
+Gen_usbtmc and Gen_serial share the reads and writes of a device file
+(FileTransport).
+
+openTransport creates the transport for an interface.
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+@ingroup measurement
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import io
+import os
+import abc
+import enum
+import errno
+import select
+import asyncio
+import collections
+
+# User modules
+from driver.scpi import messageEnd
+
+class Interfaces(enum.Enum) :
+    '''
+    This class represents the supported interfaces in the instruments.
+    '''
+    usb      = 0
+    usb_acm  = 1
+    vxi11    = 2
+    socket   = 3
+
+def openTransport(interface, port, timeout=5, **options) :
+    '''
+    Create the transport for an interface
+
+    Args:
+        interface (Interfaces) : The interface
+        port : Port of the interface (usbtmc or ttyACM index, device file, IP)
+        timeout (float) : Max. time (s) waiting for data of an answer
+        options : Other arguments of the transport class (i.e. baudrate and
+                  flow for the serial port, pipeline for the socket)
+
+    Returns:
+        A Transport.
+    '''
+    # Only the modules of the interface used are loaded (vxi11 is optional)
+    if interface == Interfaces.usb :
+        from driver.gen_usbtmc import Gen_usbtmc
+        return Gen_usbtmc(port, timeout=timeout, **options)
+    if interface == Interfaces.usb_acm :
+        from driver.gen_serial import Gen_serial
+        return Gen_serial(port, timeout=timeout, **options)
+    if interface == Interfaces.socket :
+        from driver.gen_socket import Gen_socket
+        return Gen_socket(port, timeout=timeout, **options)
+    if interface == Interfaces.vxi11 :
+        from driver.gen_vxi11 import Gen_vxi11
+        return Gen_vxi11(port, timeout=timeout, **options)
+    raise NotImplementedError("Interface not supported: %s" % str(interface))
+
+class Transport() :
+    '''
+    Buffered and framed SCPI transport.
+
+    The subclasses implement _send, _recvInto and _close. The answers are
+    received into a buffer and returned as memoryviews of it (readRaw), so
+    large blocks are not copied. The bytes received after an answer are
+    kept for the next one, which allows to pipeline the queries: post()
+    sends a query and fetch() reads the answers in order. When the
+    interface can't pipeline (pipeline = 1), post() defers the query until
+    its answer is fetched, so the callers don't need to know the interface.
+    '''
+    __metaclass__ = abc.ABCMeta
+
+    ## Initial size (bytes) of the input buffer, it grows for larger answers
+    bufsize = 65536
+    ## Terminator appended to the messages sent
+    term = b"\n"
+
+    def __init__(self, timeout=None, pipeline=1) :
+        '''
+        Constructor
+
+        Args:
+            timeout (float) : Max. time (s) waiting for data of an answer,
+                              None to wait forever
+            pipeline (int) : Max. number of queries sent before reading
+                             their answers
+        '''
+        ## Read timeout (s)
+        self.timeout = timeout
+        ## Max. number of pending answers (see post)
+        self.pipeline = max(1, pipeline)
+        ## Number of queries sent whose answer wasn't read yet
+        self.pending = 0
+        self._buf = bytearray(self.bufsize)
+        # Received bytes not returned yet: self._buf[self._start:self._end]
+        self._start = 0
+        self._end = 0
+        # Queries deferred by post (when the interface can't pipeline)
+        self._posted = collections.deque()
+        # Read running in a thread for a coroutine (see _recvIntoAsync)
+        self._reading = None
+
+    # ------------------------------------------------------------------------ #
+
+    @abc.abstractmethod
+    def _send(self, data) :
+        '''
+        Send the bytes of a message (terminator included)
+        '''
+
+    @abc.abstractmethod
+    def _recvInto(self, view) :
+        '''
+        Receive bytes into view, waiting up to the timeout
+
+        Returns:
+            The number of bytes received (0 if the connection was closed),
+            or None if nothing was received but the read can be retried.
+
+        Raises:
+            TimeoutError if nothing arrived in time.
+        '''
+
+    def _close(self) :
+        pass
+
+    # ------------------------------------------------------------------------ #
+
+    def setTimeout(self, timeout) :
+        '''
+        Set the timeout for the reads
+
+        Args:
+            timeout (float) : Timeout in seconds, None to wait forever
+
+        Returns:
+            True if the timeout was accepted.
+        '''
+        self.timeout = timeout
+        return True
+
+    def write(self, cmd) :
+        '''
+        Send a message, the terminator is appended if it's missing
+
+        Args:
+            cmd (str or bytes) : The message
+        '''
+        if isinstance(cmd, str) :
+            cmd = cmd.encode()
+        if self.term and not cmd.endswith(self.term) :
+            cmd += self.term
+        self._send(cmd)
+
+    def _space(self) :
+        '''
+        Make room at the end of the buffer for new data
+
+        Returns:
+            A memoryview of the free space.
+        '''
+        if self._start == self._end :
+            self._start = self._end = 0
+        elif self._end == len(self._buf) :
+            n = self._end - self._start
+            if self._start == 0 :
+                # A new buffer, the views returned before stay valid
+                buf = bytearray(2 * len(self._buf))
+                buf[:n] = self._buf
+                self._buf = buf
+            else :
+                # Move the partial message to the beginning
+                self._buf[:n] = self._buf[self._start:self._end]
+            self._start, self._end = 0, n
+        return memoryview(self._buf)[self._end:]
+
+    def _received(self, n) :
+        '''
+        Account the bytes received into the free space
+        '''
+        if n is None :
+            return
+        if n == 0 :
+            raise ConnectionError("Connection closed by the device")
+        self._end += n
+
+    def _reserve(self, length) :
+        '''
+        Grow the empty buffer to take an answer of the expected length
+        '''
+        if self._start == self._end and length is not None and length > len(self._buf) :
+            self._buf = bytearray(length)
+            self._start = self._end = 0
+
+    def _message(self) :
+        '''
+        Take the next complete answer from the buffer
+
+        Returns:
+            A memoryview of the answer, or None if it's not complete yet.
+        '''
+        end = messageEnd(self._buf, self._end, start=self._start)
+        if end is None :
+            return None
+        start, self._start = self._start, end
+        return memoryview(self._buf)[start:end]
+
+    def readRaw(self, length=None) :
+        '''
+        Read the next answer without copying it
+
+        Args:
+            length (int) : Expected size (bytes), so the buffer is large
+                           enough to take it at once
+
+        Returns:
+            A memoryview of the input buffer with the answer (terminator
+            included), valid until the next read.
+
+        Raises:
+            TimeoutError when the device stops sending before the end.
+        '''
+        self._reserve(length)
+        msg = self._message()
+        while msg is None :
+            self._received(self._recvInto(self._space()))
+            msg = self._message()
+        return msg
+
+    def read(self, length=None) :
+        '''
+        Read the next answer
+
+        Args:
+            length (int) : Expected size (bytes), see readRaw
+
+        Returns:
+            The answer (str) without the terminator.
+        '''
+        return bytes(self.readRaw(length)).decode().rstrip("\r\n")
+
+    def queryRaw(self, cmd, length=None) :
+        '''
+        Send a query and read its raw answer
+
+        Args:
+            cmd (str or bytes) : The query
+            length (int) : Expected size (bytes) of the answer
+
+        Returns:
+            The answer (memoryview, see readRaw).
+        '''
+        self._checkIdle()
+        self.write(cmd)
+        return self.readRaw(length)
+
+    def query(self, cmd, length=None) :
+        '''
+        Send a query and read its answer
+
+        Args:
+            cmd (str) : The query
+            length (int) : Expected size (bytes) of the answer
+
+        Returns:
+            The answer (str) without the terminator.
+        '''
+        return bytes(self.queryRaw(cmd, length)).decode().rstrip("\r\n")
+
+    def _checkIdle(self) :
+        '''
+        A query can't be sent while there are pending answers
+        '''
+        if self.pending or self._posted :
+            raise RuntimeError("%d answers pending, fetch them first"
+                               % (self.pending + len(self._posted)))
+
+    def _nextPosted(self) :
+        '''
+        Account the answer to be read next (see fetch)
+        '''
+        if self._posted :
+            self.write(self._posted.popleft())
+        elif self.pending :
+            self.pending -= 1
+        else :
+            raise RuntimeError("No query pending")
+
+    def post(self, cmd) :
+        '''
+        Send a query without waiting for its answer (see fetch)
+
+        Args:
+            cmd (str) : The query
+        '''
+        if self.pipeline > 1 :
+            self.write(cmd)
+            self.pending += 1
+        else :
+            self._posted.append(cmd)
+
+    def fetch(self, length=None) :
+        '''
+        Read the answer of the oldest query sent with post
+
+        Args:
+            length (int) : Expected size (bytes) of the answer
+
+        Returns:
+            The answer (memoryview, see readRaw).
+        '''
+        self._nextPosted()
+        return self.readRaw(length)
+
+    def _resetPending(self, marker) :
+        '''
+        Drop the posted queries and send marker (see discard)
+        '''
+        self._posted.clear()
+        self.pending = 0
+        self.write(marker[0])
+        return marker[1].encode()
+
+    def discard(self, marker) :
+        '''
+        Forget the answers of an interrupted exchange (i.e. a cancelled
+        coroutine)
+
+        The queries posted and not sent are dropped. Then marker, a query
+        with a known answer, is sent and every answer before its own one is
+        read and dropped: the device answers in order, so the answers still
+        pending come first.
+
+        Args:
+            marker (tuple) : The query and its answer (str), i.e. ("*IDN?", idn)
+        '''
+        answer = self._resetPending(marker)
+        while bytes(self.readRaw()).rstrip(b"\r\n") != answer :
+            pass
+
+    def queryMany(self, cmds) :
+        '''
+        Send several queries, keeping up to "pipeline" answers pending
+
+        Args:
+            cmds (list) : The queries
+
+        Returns:
+            A list with the answers (str).
+        '''
+        answers = []
+        sent = 0
+        while len(answers) < len(cmds) :
+            while sent < len(cmds) and self.pending + len(self._posted) < self.pipeline :
+                self.post(cmds[sent])
+                sent += 1
+            answers.append(bytes(self.fetch()).decode().rstrip("\r\n"))
+        return answers
+
+    # ------------------------------------------------------------------------ #
+    # asyncio API: the same reads as coroutines, the writes are not awaited  #
+    # ------------------------------------------------------------------------ #
+
+    def fileno(self) :
+        '''
+        File descriptor that the event loop can wait for, None if the
+        device can't be polled (the reads are run in a thread instead)
+        '''
+        return None
+
+    async def _recvIntoAsync(self, view) :
+        '''
+        Receive bytes into view without blocking the event loop
+        '''
+        loop = asyncio.get_running_loop()
+        fd = self.fileno()
+        if fd is None :
+            # A read in a thread can't be interrupted: when the coroutine is
+            # cancelled it goes on (see idleAsync)
+            self._reading = loop.run_in_executor(None, self._recvInto, view)
+            n = await asyncio.shield(self._reading)
+            self._reading = None
+            return n
+        ready = loop.create_future()
+        loop.add_reader(fd, lambda : ready.done() or ready.set_result(None))
+        try :
+            await asyncio.wait_for(ready, self.timeout)
+        except asyncio.TimeoutError :
+            raise TimeoutError("No answer from the device")
+        finally :
+            loop.remove_reader(fd)
+        return self._recvInto(view)
+
+    async def readRawAsync(self, length=None) :
+        '''
+        Coroutine version of readRaw
+        '''
+        await self.idleAsync()
+        self._reserve(length)
+        msg = self._message()
+        while msg is None :
+            self._received(await self._recvIntoAsync(self._space()))
+            msg = self._message()
+        return msg
+
+    async def queryRawAsync(self, cmd, length=None) :
+        '''
+        Coroutine version of queryRaw
+        '''
+        self._checkIdle()
+        self.write(cmd)
+        return await self.readRawAsync(length)
+
+    async def queryAsync(self, cmd, length=None) :
+        '''
+        Coroutine version of query
+        '''
+        return bytes(await self.queryRawAsync(cmd, length)).decode().rstrip("\r\n")
+
+    async def fetchAsync(self, length=None) :
+        '''
+        Coroutine version of fetch
+        '''
+        self._nextPosted()
+        return await self.readRawAsync(length)
+
+    async def idleAsync(self) :
+        '''
+        Coroutine to wait for the read of a cancelled coroutine, that goes on
+        in its thread (see _recvIntoAsync). No other read can start before,
+        and the bytes it received are kept for the next one.
+        '''
+        reading, self._reading = self._reading, None
+        if reading is None :
+            return
+        if not reading.done() :
+            await asyncio.gather(reading, return_exceptions=True)
+        if not reading.cancelled() and reading.exception() is None :
+            self._received(reading.result())
+
+    async def discardAsync(self, marker) :
+        '''
+        Coroutine version of discard
+        '''
+        await self.idleAsync()
+        answer = self._resetPending(marker)
+        while bytes(await self.readRawAsync()).rstrip(b"\r\n") != answer :
+            pass
+
+    def close(self) :
+        '''
+        Close the connection
+        '''
+        self._close()
+
+class FileTransport(Transport) :
+    '''
+    Transport over a device file (usbtmc node, serial port, pty).
+
+    When the device can be polled, each read waits (poll) up to the timeout
+    for new data and the event loop waits for the file descriptor (see
+    fileno). Otherwise the read blocks in the driver, which applies its own
+    timeout (ETIMEDOUT).
+    '''
+
+    def __init__(self, path, timeout=None, pipeline=1, pollable=True, flags=0) :
+        '''
+        Constructor
+
+        Args:
+            path (str) : The device file
+            timeout (float) : Max. time (s) waiting for data of an answer
+            pipeline (int) : Max. number of pending answers (see post)
+            pollable (boolean) : The device supports poll for the answers
+            flags (int) : Other flags to open the file (os.O_*)
+        '''
+        Transport.__init__(self, timeout, pipeline)
+        ## The device supports poll for the pending answers
+        self.pollable = pollable
+        self.device = os.open(path, os.O_RDWR | flags)
+        self._io = io.FileIO(self.device, "rb", closefd=False)
+
+    def _send(self, data) :
+        view = memoryview(data)
+        while len(view) :
+            try :
+                view = view[os.write(self.device, view):]
+            except BlockingIOError :
+                # The output queue is full (i.e. stopped by the flow control)
+                if not self._poll(select.POLLOUT) :
+                    raise TimeoutError("The device doesn't accept more data")
+
+    def _poll(self, events) :
+        '''
+        Wait up to the timeout for an event of the device
+        '''
+        poller = select.poll()
+        poller.register(self.device, events)
+        wait = None if self.timeout is None else self.timeout * 1000
+        return bool(poller.poll(wait))
+
+    def fileno(self) :
+        return self.device if self.pollable else None
+
+    def _recvInto(self, view) :
+        if self.pollable and not self._poll(select.POLLIN) :
+            raise TimeoutError("No answer from the device")
+        try :
+            return self._io.readinto(view)
+        except OSError as e :
+            if e.errno == errno.ETIMEDOUT :
+                raise TimeoutError("No answer from the device")
+            raise
+
+    def _close(self) :
+        self._io.close()
+        os.close(self.device)
@@ -0,0 +1,459 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Time alignment of the captures of different counters.
+
+The counters timestamp their samples in different time bases:
+ - FCA3103 : Instrument time in seconds (FORMAT:TINF), from its own clock.
+ - KS53230 : Host time of the day as an HHMMSS integer (time.strftime).
+normalize converts both to seconds (the HHMMSS timestamps are unwrapped at
+midnight). fitClock finds the linear mapping between two clocks, and merge
+joins two captures: each sample of the reference capture takes the nearest
+sample of the other one (a merge-asof), if it's within the tolerance. The
+runs of reference samples without a match are reported as gaps.
+
+Everything works over numpy arrays: the join is a binary search of the
+sorted timestamps (np.searchsorted), so a capture of a million samples is
+merged in a fraction of a second. The clock fit only uses a subsample of
+the matches.
+
+Usage:
+    fca = fca_data.getMeasures(len(fca_data), asarray=True)
+    ks = "ks_capture.bin"                 # or a binary file, see loadSeries
+    m = merge(fca, ks, ref_timebase="seconds", other_timebase="hhmmss",
+              clock="fit")
+    skew = m.ref - m.other
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import collections
+import numpy as np
+
+# User modules
+from misc.stability import loadSeries, estimateTau0
+from misc.epoch_store import TIMEBASES, DAY, hhmmssToSeconds
+
+## Linear mapping of a clock to another one: t_ref = slope * t + offset, with
+## the rms of the residuals (s) and the number of points used
+ClockFit = collections.namedtuple("ClockFit", ["slope", "offset", "rms", "n"])
+
+## Runs of samples: time (s) of the first one and length of each run
+Gaps = collections.namedtuple("Gaps", ["starts", "lengths"])
+
+## Result of merge: for each sample of the reference capture (sorted by time),
+## its time (s), its value, the value of the matched sample of the other
+## capture (NaN if none), the time difference of the match (s) and the index
+## of the matched sample in the other capture as it was given (-1 if none).
+## gaps are the runs without match, clock the mapping applied to the other
+## capture.
+Merged = collections.namedtuple("Merged", ["times", "ref", "other", "dt", "index",
+                                           "gaps", "clock"])
+
+## Mapping of a clock to itself
+IDENTITY = ClockFit(1.0, 0.0, 0.0, 0)
+
+def _unwrapDays(secs):
+    '''
+    Seconds of the day, in the order they were taken, to seconds from the
+    midnight of the first day
+    '''
+    secs = np.array(secs, dtype=float)
+    if len(secs) > 1:
+        # A step back of more than half a day is a new day
+        days = np.cumsum(np.diff(secs) < -DAY / 2)
+        secs[1:] += days * DAY
+    return secs
+
+def normalize(tstamps, timebase="seconds"):
+    '''
+    Convert timestamps to seconds
+
+    Args:
+        tstamps (array) : Timestamps of a capture
+        timebase (str) : Time base of the timestamps, one of TIMEBASES
+                         (see misc.epoch_store)
+
+    Returns:
+        A numpy array of seconds.
+    '''
+    if timebase not in TIMEBASES:
+        raise ValueError("Unknown time base: %s" % timebase)
+    if timebase == "hhmmss":
+        return _unwrapDays(hhmmssToSeconds(np.asarray(tstamps, dtype=float)))
+    return np.asarray(tstamps, dtype=float)
+
+def _capture(src, timebase):
+    '''
+    Load a capture with its timestamps in seconds, sorted by time
+
+    Returns:
+        The times, the values and the original position of each sample
+        (None if they were already sorted).
+    '''
+    values, tstamps = loadSeries(src)
+    if tstamps is None:
+        raise ValueError("The capture has no timestamps")
+    t = normalize(tstamps, timebase)
+    order = None
+    if len(t) > 1 and np.any(t[1:] < t[:-1]):
+        order = np.argsort(t, kind="stable")
+        t, values = t[order], values[order]
+    return t, values, order
+
+def mergeAsof(ref, other, tolerance, direction="nearest"):
+    '''
+    For each time of ref, the index of the nearest time of other
+
+    Args:
+        ref (array) : Times (s) to be matched
+        other (array) : Sorted times (s)
+        tolerance (float) : Max. distance (s) of a match
+        direction (str) : "nearest", "backward" (the last time of other
+                          <= ref) or "forward" (the first one >= ref)
+
+    Returns:
+        A numpy array of indexes of other, -1 where there is no match.
+    '''
+    ref = np.asarray(ref, dtype=float)
+    other = np.asarray(other, dtype=float)
+    n = len(other)
+    if n == 0:
+        return np.full(len(ref), -1, dtype=np.intp)
+    if direction == "backward":
+        idx = np.searchsorted(other, ref, side="right") - 1
+    elif direction == "forward":
+        idx = np.searchsorted(other, ref, side="left")
+    elif direction == "nearest":
+        idx = np.searchsorted(other, ref, side="left")
+        prev = np.clip(idx - 1, 0, n - 1)
+        cur = np.clip(idx, 0, n - 1)
+        idx = np.where(np.abs(ref - other[prev]) <= np.abs(other[cur] - ref), prev, cur)
+    else:
+        raise ValueError("Unknown direction: %s" % direction)
+    valid = (idx >= 0) & (idx < n)
+    idx = np.where(valid, idx, 0)
+    valid &= np.abs(other[idx] - ref) <= tolerance
+    return np.where(valid, idx, -1)
+
+def runs(mask, times):
+    '''
+    Runs of consecutive True values
+
+    Args:
+        mask (array) : Booleans
+        times (array) : Time of each element
+
+    Returns:
+        A Gaps tuple.
+    '''
+    m = np.concatenate(([False], np.asarray(mask, dtype=bool), [False]))
+    edges = np.flatnonzero(m[1:] != m[:-1])
+    first, last = edges[0::2], edges[1::2]
+    return Gaps(np.asarray(times)[first], last - first)
+
+def findGaps(times, period=None, factor=1.5):
+    '''
+    Missing samples in a periodic capture (i.e. missed PPS)
+
+    Args:
+        times (array) : Sorted times (s)
+        period (float) : Sampling period (s), estimated if None
+        factor (float) : A step longer than factor * period is a gap
+
+    Returns:
+        A Gaps tuple with the time of the sample before each gap and the
+        number of samples missing.
+    '''
+    times = np.asarray(times, dtype=float)
+    if period is None:
+        period = estimateTau0(times)
+    dt = np.diff(times)
+    where = np.flatnonzero(dt > factor * period)
+    return Gaps(times[where], np.rint(dt[where] / period).astype(np.int64) - 1)
+
+def _linearFit(x, y):
+    '''
+    Least squares line y = slope * x + offset
+
+    Returns:
+        A tuple (slope, offset, residuals).
+    '''
+    xm = x.mean()
+    ym = y.mean()
+    dx = x - xm
+    dy = y - ym
+    slope = np.dot(dx, dy) / np.dot(dx, dx)
+    dy -= slope * dx
+    return slope, ym - slope * xm, dy
+
+def _fitMatches(ref, other, slope, offset, tolerance, nsigma):
+    '''
+    Match ref with the mapped times of other and fit the line again
+
+    Returns:
+        A tuple (slope, offset, rms, points), points is 0 when there are
+        not enough matches.
+    '''
+    idx = mergeAsof(ref, slope * other + offset, tolerance)
+    ok = idx >= 0
+    if np.count_nonzero(ok) < 2:
+        return slope, offset, 0.0, 0
+    x = other[idx[ok]]
+    y = ref[ok]
+    slope, offset, res = _linearFit(x, y)
+    rms = np.sqrt(np.dot(res, res) / len(res))
+    keep = np.abs(res) <= max(nsigma * rms, 1e-12)
+    n = len(keep)
+    if not keep.all() and np.count_nonzero(keep) >= 2:
+        n = np.count_nonzero(keep)
+        slope, offset, res = _linearFit(x[keep], y[keep])
+        rms = np.sqrt(np.dot(res, res) / len(res))
+    return slope, offset, rms, n
+
+def _progression(at, count, span):
+    '''
+    Choose the positions of at closest to an evenly spaced progression of
+    count terms within [0, span] (the slips of a drifting clock)
+
+    Returns:
+        The predicted positions (float array) and the index in at of the
+        nearest position to each one (-1 if it's farther than 1.5).
+    '''
+    if len(at) == 0:
+        # Evenly spread, there's nothing better
+        pred = (np.arange(count) + 0.5) * span / count
+    elif count == 1:
+        # No spacing to check: the slip in the middle
+        pred = at[[np.argmin(np.abs(at - span / 2))]].astype(float)
+    else:
+        # The first slip is within a spacing of the start and the last one
+        # within a spacing of the end, try every pair of them
+        spacing = 1.2 * span / count
+        first = at[at <= spacing]
+        last = at[at >= span - spacing]
+        if len(first) == 0 or len(last) == 0:
+            first = last = at[[0, -1]]
+        terms = np.arange(count)
+        best, pred = -1, None
+        for a in first:
+            step = (last - a) / (count - 1)
+            cand = a + step[:, None] * terms
+            i = np.clip(np.searchsorted(at, cand), 1, len(at) - 1)
+            near = np.minimum(np.abs(at[i] - cand), np.abs(at[i - 1] - cand))
+            hits = np.count_nonzero(near <= 1.5, axis=1)
+            j = np.argmax(hits)
+            if hits[j] > best:
+                best, pred = hits[j], cand[j]
+    if len(at) == 0:
+        return pred, np.full(count, -1, dtype=np.int64)
+    i = np.clip(np.searchsorted(at, pred), 1, len(at) - 1)
+    i -= np.abs(at[i - 1] - pred) <= np.abs(at[i] - pred)
+    i[np.abs(at[i] - pred) > 1.5] = -1
+    return pred, i
+
+def _slipFit(ref, other, resolution):
+    '''
+    Fit the mapping of timestamps quantized to the sampling period (see
+    fitClock), times relative to the first samples
+
+    Returns:
+        A tuple (slope, offset, rms, points).
+    '''
+    period = estimateTau0(ref)
+    epochs = np.rint(ref / period).astype(np.int64)
+    steps = np.rint(other / resolution).astype(np.int64)
+    # Steps gained (+) or lost (-) by the other clock over the capture
+    slips = int(steps[-1] - epochs[-1])
+    jumps = np.diff(steps)
+    if slips > 0:
+        # A gained step looks like a missed sample
+        where = np.flatnonzero(jumps >= 2) + 1
+    else:
+        # A lost step repeats the timestamp
+        where = np.flatnonzero(jumps == 0) + 1
+    slip = np.zeros(len(steps), dtype=np.int64)
+    after = np.zeros(0, dtype=np.int64)
+    if slips:
+        pred, i = _progression(steps[where], abs(slips), float(steps[-1]))
+        # First sample after each slip, the predicted ones without a
+        # candidate have a missed sample there
+        after = np.searchsorted(steps, np.rint(pred))
+        after[i >= 0] = where[i[i >= 0]]
+        after = after[after < len(steps)]
+        np.add.at(slip, after, 1)
+    est = steps - np.sign(slips) * np.cumsum(slip)
+    # Pairs of samples of the same epoch
+    j = np.searchsorted(epochs, est)
+    j[j == len(epochs)] = 0
+    ok = epochs[j] == est
+    if np.count_nonzero(ok) < 2:
+        return 1.0, 0.0, 0.0, 0
+    # Epochs of ref: ref = rslope * epoch + roffset
+    rslope, roffset, _ = _linearFit(est[ok].astype(float), ref[j[ok]])
+    # Steps of other: steps = dslope * epoch + doffset. The timestamps are
+    # floored, but at a slip the other clock has just crossed a whole step
+    # (at the first sample after a gained step, at the first one of a
+    # repeated timestamp), so the line is fitted on the slips seen between
+    # consecutive epochs.
+    anchors = after[after > 0]
+    anchors = anchors[est[anchors] - est[anchors - 1] == 1] - (slips < 0)
+    if len(anchors) >= 2:
+        dslope, doffset, _ = _linearFit(est[anchors].astype(float),
+                                        steps[anchors].astype(float))
+        doffset -= 0.5
+    else:
+        # Without slips the timestamps are floored evenly
+        dslope, doffset, _ = _linearFit(est.astype(float), steps.astype(float))
+    slope = rslope / (dslope * resolution)
+    offset = roffset - rslope * doffset / dslope
+    res = ref[j[ok]] - (slope * other[ok] + offset)
+    rms = np.sqrt(np.dot(res, res) / len(res))
+    return slope, offset, rms, len(res)
+
+def fitClock(ref, other, tolerance=None, iterations=4, nsigma=3.0, points=65536, first=1024,
+             resolution=0):
+    '''
+    Fit the linear mapping from the clock of other to the clock of ref
+
+    Both series must sample the same events (i.e. a PPS) and their first
+    samples must be the same event, at least within the tolerance. The
+    samples are matched with the current mapping and it's fitted again
+    from the matched pairs (least squares, the points farther than nsigma
+    times the rms are dropped).
+
+    The fit starts with the first "first" samples of ref, where the drift
+    between the clocks is still far below the tolerance, and the window is
+    doubled each time, so the mapping extrapolated to the new samples keeps
+    them matched with the right ones. On the whole capture, it's refined
+    until the fit doesn't change. Only "points" samples of each window,
+    evenly spaced, are used for the fit.
+
+    When the timestamps of other are quantized to the tolerance or coarser
+    (i.e. HHMMSS timestamps of a PPS), matching the nearest sample doesn't
+    work: no window shows the drift, the timestamps only slip a whole
+    second from time to time (a gained second looks like a missed sample,
+    a lost one repeats the timestamp). Then both captures must end with the
+    same event as well: the end-to-end spans give the number of slips, and
+    they are placed on the evenly spaced candidates (the ones without a
+    candidate fall on a missed sample). That gives the epoch of every
+    sample of other, and the clock of other crosses a whole second at each
+    slip, which fixes the mapping without the bias of the floored
+    timestamps. A slip next to a missed sample may be placed a few samples
+    away from the right one.
+
+    Args:
+        ref (array) : Sorted times (s) in the reference clock
+        other (array) : Sorted times (s) in the other clock (i.e. host)
+        tolerance (float) : Max. distance (s) of a match, half the sampling
+                            period of ref if None
+        iterations (int) : Max. number of refinements on the whole capture
+        nsigma (float) : Rejection threshold of the outliers
+        points (int) : Max. number of points used for each fit
+        first (int) : Number of samples of the first window
+        resolution (float) : Resolution (s) of the timestamps of other, it
+                             must be the sampling period when it's coarser
+                             than the tolerance
+
+    Returns:
+        A ClockFit tuple.
+    '''
+    ref = np.asarray(ref, dtype=float)
+    other = np.asarray(other, dtype=float)
+    if len(ref) == 0 or len(other) == 0:
+        raise ValueError("Empty series")
+    if tolerance is None:
+        tolerance = estimateTau0(ref) / 2
+    # Times relative to the first samples (the same event), to keep the
+    # precision of the offset
+    x0, y0 = other[0], ref[0]
+    other = other - x0
+    ref = ref - y0
+    if resolution >= tolerance:
+        slope, offset, rms, n = _slipFit(ref, other, resolution)
+        return ClockFit(float(slope), float(y0 + offset - slope * x0), float(rms), int(n))
+    slope, offset, rms, n = 1.0, 0.0, 0.0, 1
+    end = min(len(ref), first)
+    while True:
+        sub = ref[:end:max(1, end // points)]
+        # The slope of a window is reliable enough for twice its length
+        fit = _fitMatches(sub, other, slope, offset, tolerance, nsigma)
+        if fit[3]:
+            slope, offset, rms, n = fit
+        if end == len(ref):
+            break
+        end = min(len(ref), 2 * end)
+    for i in range(iterations - 1):
+        fit = _fitMatches(sub, other, slope, offset, tolerance, nsigma)
+        if not fit[3] or (fit[0], fit[1]) == (slope, offset):
+            break
+        slope, offset, rms, n = fit
+    return ClockFit(float(slope), float(y0 + offset - slope * x0), float(rms), int(n))
+
+def mapClock(fit, times):
+    '''
+    Convert times to the reference clock of a ClockFit
+    '''
+    return fit.slope * np.asarray(times, dtype=float) + fit.offset
+
+def merge(ref, other, tolerance=None, ref_timebase="seconds", other_timebase="seconds",
+          clock=None, direction="nearest"):
+    '''
+    Join two captures by their timestamps
+
+    Args:
+        ref : The reference capture, see misc.stability.loadSeries
+        other : The capture to be joined to ref
+        tolerance (float) : Max. distance (s) of a match, half the sampling
+                            period of ref if None
+        ref_timebase (str) : Time base of the timestamps of ref (see normalize)
+        other_timebase (str) : Time base of the timestamps of other
+        clock : Mapping of the times of other to the clock of ref: a
+                ClockFit, "fit" to estimate it (see fitClock) or None for
+                the same clock
+        direction (str) : See mergeAsof
+
+    Returns:
+        A Merged tuple, with a row for each sample of ref in time order.
+    '''
+    t_ref, v_ref, _ = _capture(ref, ref_timebase)
+    t_other, v_other, order = _capture(other, other_timebase)
+    if tolerance is None:
+        tolerance = estimateTau0(t_ref) / 2
+    if clock is None:
+        clock = IDENTITY
+    elif clock == "fit":
+        clock = fitClock(t_ref, t_other, tolerance,
+                         resolution=1.0 if other_timebase == "hhmmss" else 0)
+    mapped = mapClock(clock, t_other)
+    idx = mergeAsof(t_ref, mapped, tolerance, direction)
+    ok = idx >= 0
+    vals = np.full(len(t_ref), np.nan)
+    dt = np.full(len(t_ref), np.nan)
+    vals[ok] = v_other[idx[ok]]
+    dt[ok] = mapped[idx[ok]] - t_ref[ok]
+    if order is not None:
+        # Index of the sample in other as it was given
+        idx[ok] = order[idx[ok]]
+    return Merged(t_ref, v_ref, vals, dt, idx, runs(~ok, t_ref), clock)
@@ -0,0 +1,331 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Timestamp-keyed store for the samples of several instruments.
+
+When several counters measure the same PPS at once, the samples of each
+epoch (one period of the trigger) belong to a single row, with a column
+for each instrument. Each column follows the MeasuredData of an instrument
+(see MeasuredData.addListener) and places every sample in the row of its
+epoch:
+ - The first sample is placed by its host arrival time, relative to the
+   start of the measurement (see EpochStore.arm). When the first samples
+   arrive as a block, that's the time of the newest one, and the older
+   ones are placed backwards from it.
+ - The next ones by their own timestamps, relative to the first one, so
+   the missed triggers of an instrument leave a gap in its column instead
+   of shifting it. The samples without timestamp are placed one epoch
+   after the previous one.
+
+A row is ready as soon as every column has a value for it, or has moved
+to a later epoch (the missing values are NaN). The ready rows are taken
+with takeRows while the instruments are measuring.
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import math
+import time
+import threading
+import collections
+
+## Time bases of the timestamps: instrument seconds (i.e. FORMAT:TINF of the
+## FCA3103) or host time as an HHMMSS integer (KS53230)
+TIMEBASES = ("seconds", "hhmmss")
+
+## Seconds in a day, the HHMMSS timestamps wrap at midnight
+DAY = 86400
+
+def hhmmssToSeconds(ts):
+    '''
+    Convert HHMMSS timestamps (int(time.strftime("%H%M%S"))) to seconds of the day
+
+    Args:
+        ts : A timestamp or a numpy array of them (see misc.alignment)
+    '''
+    ts = ts // 1
+    return (ts // 10000) * 3600 + (ts // 100 % 100) * 60 + ts % 100
+
+class EpochColumn():
+    '''
+    Column of an instrument in an EpochStore.
+
+    It's a listener of the MeasuredData of the instrument (it has the add
+    and addBlock methods, see MeasuredData.addListener).
+    '''
+
+    def __init__(self, store, index, name, timebase):
+        '''
+        Constructor, see EpochStore.column
+        '''
+        if timebase not in TIMEBASES:
+            raise ValueError("Unknown time base: %s" % timebase)
+        self._store = store
+        self.index = index
+        self.name = name
+        self.timebase = timebase
+        ## Epoch of the last sample, None before the first one
+        self.last = None
+        ## Timestamp (s) of the first sample and its epoch
+        self._t0 = None
+        self._e0 = None
+        ## Samples placed in an epoch that already had a value
+        self.duplicated = 0
+
+    def _seconds(self, ts):
+        if self.timebase == "hhmmss":
+            return hhmmssToSeconds(ts)
+        return ts
+
+    def _start(self, ts):
+        '''
+        Epoch of the first sample, from its arrival time
+        '''
+        epoch = self._store.arrivalEpoch()
+        if not math.isnan(ts):
+            self._t0, self._e0 = self._seconds(ts), epoch
+        return epoch
+
+    def _epoch(self, ts):
+        '''
+        Epoch of a new sample
+        '''
+        store = self._store
+        if self.last is None:
+            return self._start(ts)
+        if math.isnan(ts) or self._t0 is None:
+            return self.last + 1
+        dt = self._seconds(ts) - self._t0
+        if self.timebase == "hhmmss" and dt < 0:
+            dt += DAY
+        return self._e0 + int(round(dt / store.period))
+
+    def add(self, x, ts=math.nan):
+        self._store._put(self, self._epoch(ts), x)
+
+    def addBlock(self, values, tstamps):
+        n = len(values)
+        if n == 0:
+            return
+        if self.last is not None:
+            for x, ts in zip(values, tstamps):
+                self.add(x, ts)
+            return
+        # The first block arrives with its newest sample, the older ones
+        # are placed backwards from it
+        store = self._store
+        newest = self._start(tstamps[n - 1])
+        for i, (x, ts) in enumerate(zip(values, tstamps)):
+            if math.isnan(ts) or self._t0 is None:
+                epoch = newest - (n - 1 - i)
+            else:
+                dt = self._seconds(ts) - self._t0
+                if self.timebase == "hhmmss" and abs(dt) > DAY / 2:
+                    dt -= math.copysign(DAY, dt)
+                epoch = newest + int(round(dt / store.period))
+            store._put(self, epoch, x)
+
+class EpochStore():
+    '''
+    Rows of samples of several instruments keyed by the epoch of the trigger.
+
+    Usage:
+        store = EpochStore(period=1)
+        fca_data.addListener(store.column("fca", "seconds"))
+        ks_data.addListener(store.column("ks", "hhmmss"))
+        store.arm(start)
+        ...
+        for epoch, (fca, ks) in store.takeRows() :
+            ...
+
+    See driver.acquisition, which does all of this.
+    '''
+
+    def __init__(self, period=1.0):
+        '''
+        Constructor
+
+        Args:
+            period (float) : Period (s) of the trigger, i.e. 1 for a PPS
+        '''
+        self.period = period
+        ## Columns of the rows (EpochColumn), in order
+        self.columns = []
+        ## Host time (s) of the epoch 0, see arm
+        self.start = None
+        ## Rows not completed yet: {epoch : values}
+        self._pending = {}
+        ## Completed rows not taken yet: (epoch, values)
+        self._ready = collections.deque()
+        ## Last epoch moved to the completed rows
+        self._done = -1
+        ## Missing values in the completed rows of each column
+        self.missing = []
+        ## Samples older than the completed rows (dropped)
+        self.late = 0
+        self._lock = threading.Lock()
+
+    def column(self, name, timebase="seconds"):
+        '''
+        Method to add a column for an instrument
+
+        Args:
+            name (str) : Name of the column
+            timebase (str) : Time base of the timestamps, one of TIMEBASES
+
+        Returns:
+            An EpochColumn to be registered as listener of the MeasuredData
+            of the instrument.
+        '''
+        with self._lock:
+            if self._pending or self._ready:
+                raise RuntimeError("The columns must be added before the samples")
+            col = EpochColumn(self, len(self.columns), name, timebase)
+            self.columns.append(col)
+            self.missing.append(0)
+        return col
+
+    @property
+    def names(self):
+        return [c.name for c in self.columns]
+
+    def arm(self, start=None):
+        '''
+        Method to set the host time of the epoch 0
+
+        Args:
+            start (float) : Host time (s) of the first trigger, now if None
+        '''
+        self.start = time.time() if start is None else start
+
+    def reset(self):
+        '''
+        Method to start a new measurement with the same columns, the rows
+        not taken yet are dropped
+        '''
+        with self._lock:
+            self.start = None
+            self._pending.clear()
+            self._ready.clear()
+            self._done = -1
+            self.missing = [0] * len(self.columns)
+            self.late = 0
+            for col in self.columns:
+                col.last = None
+                col._t0 = col._e0 = None
+                col.duplicated = 0
+
+    def arrivalEpoch(self):
+        '''
+        Epoch of a sample that arrives now (the answer arrives shortly after
+        its trigger)
+        '''
+        if self.start is None:
+            raise RuntimeError("The store is not armed")
+        return max(0, int(round((time.time() - self.start) / self.period)))
+
+    def _put(self, col, epoch, x):
+        '''
+        Place a value in the row of an epoch
+        '''
+        with self._lock:
+            if epoch <= self._done:
+                self.late += 1
+                return
+            row = self._pending.get(epoch)
+            if row is None:
+                row = self._pending[epoch] = [math.nan] * len(self.columns)
+            if not math.isnan(row[col.index]):
+                col.duplicated += 1
+            else:
+                row[col.index] = x
+            if col.last is None or epoch > col.last:
+                col.last = epoch
+            self._complete()
+
+    def _complete(self):
+        '''
+        Move the completed rows to the ready queue (lock must be held)
+        '''
+        # Every column moved past this epoch
+        horizon = min(-1 if c.last is None else c.last for c in self.columns)
+        while self._pending:
+            epoch = self._done + 1
+            row = self._pending.get(epoch)
+            if epoch < horizon or (row is not None and not any(map(math.isnan, row))):
+                if row is None:
+                    row = [math.nan] * len(self.columns)
+                else:
+                    del self._pending[epoch]
+                for i, x in enumerate(row):
+                    if math.isnan(x):
+                        self.missing[i] += 1
+                self._ready.append((epoch, tuple(row)))
+                self._done = epoch
+            else:
+                break
+
+    def takeRows(self, count=None):
+        '''
+        Method to take the completed rows
+
+        Args:
+            count (int) : Max. number of rows, None for all of them
+
+        Returns:
+            A list of (epoch, values) in epoch order, values has a float
+            for each column (NaN when the instrument missed the epoch).
+        '''
+        rows = []
+        with self._lock:
+            while self._ready and (count is None or len(rows) < count):
+                rows.append(self._ready.popleft())
+        return rows
+
+    def flush(self):
+        '''
+        Method to complete all the rows, i.e. at the end of the measurement
+
+        Returns:
+            The rows not taken yet (see takeRows).
+        '''
+        with self._lock:
+            for epoch in sorted(self._pending):
+                while self._done + 1 < epoch:
+                    self._done += 1
+                    self._ready.append((self._done, (math.nan,) * len(self.columns)))
+                    self.missing = [m + 1 for m in self.missing]
+                row = self._pending.pop(epoch)
+                for i, x in enumerate(row):
+                    if math.isnan(x):
+                        self.missing[i] += 1
+                self._ready.append((epoch, tuple(row)))
+                self._done = epoch
+        return self.takeRows()
+
+    def __len__(self):
+        '''
+        Number of completed rows not taken yet
+        '''
+        return len(self._ready)
@@ -31,7 +31,19 @@ another thread can save the data, print the data or do some kind of statistics.
 #                                   Import                                    --
 #-------------------------------------------------------------------------------
 # Import system modules
-import queue
+import os
+import math
+import numbers
+import time
+import logging
+import tempfile
+import threading
+import collections
+from array import array
+import numpy as np
+
+# User modules
+from misc.measured_file import MeasFileWriter
 
 # Custom exceptions for the module
 class ContainerEmpty(Exception):
@@ -50,72 +62,978 @@ class BufferSaved(Exception):
     def __init__(self, message="The data buffer is already saved to a file"):
         self.message = message
 
+class ReaderOverrun(Exception):
+    def __init__(self, message, lost):
+        self.message = message
+        self.lost = lost
+
+## Snapshot of the running statistics of a MeasuredData
+Stats = collections.namedtuple("Stats", ["count", "mean", "variance", "min", "max",
+                                         "last", "last_tstamp"])
+
+class RunningStats():
+    '''
+    Running statistics of a stream of samples, O(1) per sample.
+
+    The mean and the variance are computed with the Welford algorithm, blocks
+    of samples are merged with the Chan et al. formula. After each update a
+    new immutable Stats snapshot is published, so readers just take the last
+    one without locking.
+    '''
+
+    def __init__(self):
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._min = math.inf
+        self._max = -math.inf
+        self._last = math.nan
+        self._last_ts = math.nan
+        ## Last published snapshot
+        self.snapshot = Stats(0, math.nan, math.nan, math.nan, math.nan, math.nan, math.nan)
+
+    def add(self, x, ts=math.nan):
+        '''
+        Add a sample
+
+        Args:
+            x (float) : The value
+            ts (float) : Its timestamp (NaN if it has not)
+        '''
+        self._n += 1
+        delta = x - self._mean
+        self._mean += delta / self._n
+        self._m2 += delta * (x - self._mean)
+        if x < self._min: self._min = x
+        if x > self._max: self._max = x
+        self._last = x
+        if ts == ts: self._last_ts = ts
+        self._publish()
+
+    def addBlock(self, values, tstamps):
+        '''
+        Add a block of samples
+
+        Args:
+            values (array) : The values
+            tstamps (array) : Their timestamps (NaN for no timestamp)
+        '''
+        n = len(values)
+        if n == 0:
+            return
+        # Views of the arrays, the block statistics are computed by numpy
+        values = np.asarray(values, dtype=float)
+        tstamps = np.asarray(tstamps, dtype=float)
+        mean = float(values.mean())
+        dev = values - mean
+        m2 = float(np.dot(dev, dev))
+        total = self._n + n
+        delta = mean - self._mean
+        self._mean += delta * n / total
+        self._m2 += m2 + delta * delta * self._n * n / total
+        self._n = total
+        self._min = min(self._min, float(values.min()))
+        self._max = max(self._max, float(values.max()))
+        self._last = float(values[-1])
+        valid = np.flatnonzero(tstamps == tstamps)
+        if len(valid):
+            self._last_ts = float(tstamps[valid[-1]])
+        self._publish()
+
+    def _publish(self):
+        var = self._m2 / (self._n - 1) if self._n > 1 else math.nan
+        self.snapshot = Stats(self._n, self._mean, var, self._min, self._max,
+                              self._last, self._last_ts)
+
+class _Chunk():
+    '''
+    A fixed size piece of the storage of MeasuredData.
+
+    Values and timestamps are kept in two preallocated arrays, so adding
+    samples never resizes them and the views returned to the readers stay
+    valid. The samples between start and end are not read yet.
+    '''
+    __slots__ = ("values", "tstamps", "start", "end")
+
+    def __init__(self, size):
+        zeros = bytes(8 * size)
+        self.values = array("d", zeros)
+        self.tstamps = array("d", zeros)
+        self.start = 0
+        self.end = 0
+
+class _SpilledChunk():
+    '''
+    A chunk of MeasuredData moved to the spill file.
+
+    The file holds the values of the chunk at offset and the timestamps
+    just after them. The samples between start and end are not read yet.
+    '''
+    __slots__ = ("offset", "size", "start", "end")
+
+    def __init__(self, offset, size):
+        self.offset = offset
+        self.size = size
+        self.start = 0
+        self.end = size
+
+## Policies of a bounded MeasuredData when it's full
+POLICIES = ("block", "drop_oldest", "drop_newest", "spill")
+
+class RingBuffer():
+    '''
+    Fixed capacity buffer shared by several readers (broadcast).
+
+    Each sample is written once and every reader (see reader) has its own
+    cursor, so all of them see all the samples. The producer never waits:
+    when the buffer is full the oldest samples are overwritten, and a
+    reader that didn't take them gets a ReaderOverrun on its next read.
+
+    It can be the container of a measurement (addMeasures) or a listener
+    of a MeasuredData (add/addBlock).
+    '''
+
+    def __init__(self, capacity):
+        '''
+        Constructor
+
+        Args:
+            capacity (int) : Number of samples kept in the buffer
+        '''
+        if capacity <= 0:
+            raise ValueError("The capacity must be positive (%d)" % capacity)
+        zeros = bytes(8 * capacity)
+        self.capacity = capacity
+        self._values = array("d", zeros)
+        self._tstamps = array("d", zeros)
+        ## Number of samples written since the creation
+        self.written = 0
+        self._cond = threading.Condition()
+
+    def add(self, x, ts=math.nan):
+        '''
+        Add a sample
+        '''
+        with self._cond:
+            pos = self.written % self.capacity
+            self._values[pos] = x
+            self._tstamps[pos] = ts
+            self.written += 1
+            self._cond.notify_all()
+
+    def addBlock(self, values, tstamps):
+        '''
+        Add a block of samples (arrays of the same length)
+        '''
+        n = len(values)
+        skip = max(0, n - self.capacity)
+        with self._cond:
+            self.written += skip
+            i = skip
+            while i < n:
+                pos = self.written % self.capacity
+                k = min(n - i, self.capacity - pos)
+                self._values[pos:pos + k] = values[i:i + k]
+                self._tstamps[pos:pos + k] = tstamps[i:i + k]
+                self.written += k
+                i += k
+            self._cond.notify_all()
+
+    def addMeasures(self, meas, tstamp=None):
+        '''
+        Method to add new measures, see MeasuredData.addMeasures
+        '''
+        if isinstance(meas, numbers.Real):
+            self.add(meas, math.nan if tstamp is None else tstamp)
+            return
+        n = len(meas)
+        if tstamp is None:
+            tstamp = array("d", (math.nan,)) * n
+        if len(tstamp) != n:
+            raise ValueError("Different number of measures (%d) and timestamps (%d)"
+                             % (n, len(tstamp)))
+        self.addBlock(MeasuredData._column(meas, 0, n), MeasuredData._column(tstamp, 0, n))
+
+    def reader(self, oldest=False):
+        '''
+        Method to register a new reader
+
+        Args:
+            oldest (boolean) : Start from the oldest sample in the buffer
+                               instead of the next one added
+
+        Returns:
+            A RingReader.
+        '''
+        with self._cond:
+            start = max(0, self.written - self.capacity) if oldest else self.written
+            return RingReader(self, start)
+
+class RingReader():
+    '''
+    A cursor over a RingBuffer.
+
+    The samples are returned as read-only views of the buffer (no copy).
+    The producer doesn't wait for the readers, so a view stays valid until
+    the producer overwrites it: call stale() after using the last views
+    to know if that happened.
+    '''
+
+    def __init__(self, ring, start):
+        self._ring = ring
+        ## Index (since the creation of the buffer) of the next sample to read
+        self.cursor = start
+        self._last = start
+        ## Number of samples lost because of overruns
+        self.lost = 0
+
+    def available(self):
+        '''
+        Number of samples ready to be read (it may be more than the capacity)
+        '''
+        return self._ring.written - self.cursor
+
+    def _checkOverrun(self):
+        '''
+        Skip the overwritten samples (lock must be held)
+        '''
+        ring = self._ring
+        oldest = ring.written - ring.capacity
+        if self.cursor < oldest:
+            lost = oldest - self.cursor
+            self.cursor = oldest
+            self.lost += lost
+            raise ReaderOverrun(message="%d samples overwritten before being read" % lost,
+                                lost=lost)
+
+    def read(self, count=None, timeout=0):
+        '''
+        Method to read the next samples without copying them
+
+        At most count samples are returned, less if they wrap around the
+        end of the buffer (the rest is returned by the next call).
+
+        Args:
+            count (int) : Max. number of samples (None for all the available)
+            timeout (float) : Max. time (s) waiting for samples (None to wait forever)
+
+        Returns:
+            A tuple of two read-only memoryviews (values, timestamps), empty
+            if there are no samples.
+
+        Raises:
+            ReaderOverrun when samples were overwritten before being read,
+            the cursor moves to the oldest sample kept.
+        '''
+        ring = self._ring
+        with ring._cond:
+            if timeout != 0:
+                ring._cond.wait_for(lambda: ring.written > self.cursor, timeout)
+            self._checkOverrun()
+            pos = self.cursor % ring.capacity
+            k = min(ring.written - self.cursor, ring.capacity - pos)
+            if count is not None:
+                k = min(k, count)
+            self._last = self.cursor
+            self.cursor += k
+        values = memoryview(ring._values)[pos:pos + k].toreadonly()
+        tstamps = memoryview(ring._tstamps)[pos:pos + k].toreadonly()
+        return values, tstamps
+
+    def take(self, count, copy=False):
+        '''
+        Method to read exactly count samples
+
+        The samples are copied only when they wrap around the end of the
+        buffer, or when copy is set: then they are copied before releasing
+        the buffer, so they can't be overwritten while they are used.
+
+        Args:
+            count (int) : Number of samples
+            copy (boolean) : Always copy the samples
+
+        Returns:
+            A tuple of two read-only memoryviews (values, timestamps).
+
+        Raises:
+            ContainerEmpty if there are less than count samples.
+            ReaderOverrun, see read.
+        '''
+        with self._ring._cond:
+            self._checkOverrun()
+            if count > self.available():
+                raise ContainerEmpty(message="No more data is ready to be fetch",
+                                     available=self.available(), requested=count)
+            first = self.cursor
+            values, tstamps = self.read(count)
+            if len(values) < count:
+                rest_v, rest_ts = self.read(count - len(values))
+                values = array("d", values.tobytes() + rest_v.tobytes())
+                tstamps = array("d", tstamps.tobytes() + rest_ts.tobytes())
+                values = memoryview(values).toreadonly()
+                tstamps = memoryview(tstamps).toreadonly()
+            elif copy:
+                values = memoryview(array("d", values.tobytes())).toreadonly()
+                tstamps = memoryview(array("d", tstamps.tobytes())).toreadonly()
+            self._last = first
+        return values, tstamps
+
+    def stale(self):
+        '''
+        Check if the views returned by the last read were overwritten
+
+        Returns:
+            True if the producer reused that part of the buffer.
+        '''
+        return self._ring.written - self._ring.capacity > self._last
+
 class MeasuredData():
     '''
     Class that implements a container for storing the measured values from the instruments.
+
+    The samples are stored in columns (values and timestamps) of 64 bits floats.
+    A timestamp set to NaN means that the sample has no timestamp.
+
+    When a bounded container is full, the policy selects what addMeasures does:
+     - "block" : Wait for free space up to _timeout seconds, then raise ContainerFull.
+     - "drop_oldest" : Discard the oldest samples not read yet.
+     - "drop_newest" : Discard the new samples.
+     - "spill" : Move chunks to a temporary file, they are paged back when
+       getMeasures reaches them. Only "size" samples are kept in memory.
+    The discarded samples are counted in the dropped attribute.
+
+    In broadcast mode, the samples are kept in a RingBuffer of "size" samples
+    instead. getMeasures, the flusher and any other reader (see reader) take
+    the samples with their own cursors, so all of them get every sample, and
+    adding samples never blocks.
     '''
     ## Blocking timeout
     _timeout = 5
+    ## Number of samples in each chunk of the storage
+    _chunksize = 65536
 
-    def __init__(self, size=0):
+    def __init__(self, size=0, broadcast=False, policy="block", spill_dir=None):
         '''
         Constructor
 
         Args:
             size (int) : An integer that sets the upperbound limit of the number of items in the queue. Use 0 for an unlimited queue.
+            broadcast (boolean) : Enable the broadcast mode, size is the capacity of the ring buffer
+            policy (str) : What to do when the container is full, see POLICIES
+            spill_dir (str) : Directory for the spill file (default temporary directory)
         '''
-        ## The internal thread-safe queue
-        self._queue = queue.Queue(maxsize=size)
+        if policy not in POLICIES:
+            raise ValueError("Unknown policy: %s" % policy)
+        ## Max. number of samples (0 for unlimited)
+        self._size = size
+        ## Policy when the container is full
+        self._policy = policy
+        ## Number of samples discarded by the drop policies
+        self.dropped = 0
+        ## Number of samples moved to the spill file
+        self.spilled = 0
+        ## Spill file (created when needed), next free offset and samples pending in it
+        self._spillFile = None
+        self._spillDir = spill_dir
+        self._spillEnd = 0
+        self._onDisk = 0
+        ## Chunks being written to the spill file and their samples
+        self._writing = set()
+        self._spilling = 0
+        ## Lock for the storage, also used to wait for free space
+        self._lock = threading.Condition()
+        ## Chunks with the stored samples, from oldest to newest
+        self._chunks = collections.deque()
+        ## Number of samples in the container
+        self._count = 0
+        ## Statistics of all the samples added
+        self._stats = RunningStats()
+        ## Objects updated with every sample added (see addListener)
+        self._listeners = [self._stats]
+        ## Storage of the broadcast mode and cursor used by getMeasures
+        self._ring = None
+        self._reader = None
+        if broadcast:
+            if size <= 0:
+                raise ValueError("The broadcast mode needs a size")
+            self._ring = RingBuffer(size)
+            self._reader = self._ring.reader()
+            self._listeners.insert(0, self._ring)
+        if size > 0 and size < self._chunksize:
+            self._chunksize = size
+        if policy == "spill" and size > 0:
+            # Several chunks are needed to keep some of them in memory
+            self._chunksize = min(self._chunksize, max(1, size // 4))
+        ## Background writer (see startFlusher)
+        self._flusher = None
+        ## Number of samples that wakes up the writer before its period
+        self._flushThreshold = 0
+        ## Event to wake up the writer
+        self._flushEvent = threading.Event()
+        ## Event to stop the writer
+        self._flushStop = threading.Event()
+        ## Cursor of the writer in broadcast mode
+        self._flushReader = None
+
+    def __len__(self):
+        '''
+        Number of samples ready to be fetch
+        '''
+        if self._ring is not None:
+            return min(self._reader.available(), self._ring.capacity)
+        return self._count
 
     def addMeasures(self, meas, tstamp=None):
         '''
-        Method to add a new measure to the buffer (thread-safe)
+        Method to add new measures to the buffer (thread-safe)
+
+        A single sample or a sequence of samples (i.e. an array('d') with
+        the readings of a block) can be added at once.
 
         Args:
-            meas (float) : A new measure
-            tstamp (float) : Timestamp value for the measure
+            meas (float or sequence) : A new measure or a sequence of measures
+            tstamp (float or sequence) : Timestamp value for the measure(s)
+
+        Raises:
+            ContainerFull when the container is bounded, the policy is "block"
+            and there isn't free space after waiting _timeout seconds.
         '''
+        if self._ring is not None:
+            self._broadcast(meas, tstamp)
+            return
+        if isinstance(meas, numbers.Real):
+            self._addSample(meas, math.nan if tstamp is None else tstamp)
+            return
+        if tstamp is None:
+            tstamp = array("d", (math.nan,)) * len(meas)
+
+        n = len(meas)
+        if len(tstamp) != n:
+            raise ValueError("Different number of measures (%d) and timestamps (%d)"
+                             % (n, len(tstamp)))
+        with self._lock:
+            i = 0
+            while i < n:
+                free = self._waitSpace(n - i)
+                if free <= 0:
+                    self.dropped += n - i
+                    break
+                tail = self._chunks[-1] if self._chunks else None
+                if tail is None or tail.end == len(tail.values):
+                    tail = _Chunk(self._chunksize)
+                    self._chunks.append(tail)
+                k = min(n - i, free, len(tail.values) - tail.end)
+                values = self._column(meas, i, k)
+                tstamps = self._column(tstamp, i, k)
+                tail.values[tail.end:tail.end + k] = values
+                tail.tstamps[tail.end:tail.end + k] = tstamps
+                for l in self._listeners:
+                    l.addBlock(values, tstamps)
+                tail.end += k
+                self._count += k
+                i += k
+            if self._flushThreshold and self._count >= self._flushThreshold:
+                self._flushEvent.set()
+
+    def _addSample(self, meas, tstamp):
+        '''
+        Add a single sample, fast path of addMeasures
+        '''
+        with self._lock:
+            if self._waitSpace() <= 0:
+                self.dropped += 1
+                return
+            tail = self._chunks[-1] if self._chunks else None
+            if tail is None or tail.end == len(tail.values):
+                tail = _Chunk(self._chunksize)
+                self._chunks.append(tail)
+            tail.values[tail.end] = meas
+            tail.tstamps[tail.end] = tstamp
+            for l in self._listeners:
+                l.add(meas, tstamp)
+            tail.end += 1
+            self._count += 1
+            if self._flushThreshold and self._count >= self._flushThreshold:
+                self._flushEvent.set()
+
+    def _broadcast(self, meas, tstamp):
+        '''
+        Add samples in broadcast mode (see addMeasures)
+        '''
+        with self._lock:
+            if isinstance(meas, numbers.Real):
+                ts = math.nan if tstamp is None else tstamp
+                for l in self._listeners:
+                    l.add(meas, ts)
+            else:
+                n = len(meas)
+                if tstamp is None:
+                    tstamp = array("d", (math.nan,)) * n
+                if len(tstamp) != n:
+                    raise ValueError("Different number of measures (%d) and timestamps (%d)"
+                                     % (n, len(tstamp)))
+                values = self._column(meas, 0, n)
+                tstamps = self._column(tstamp, 0, n)
+                for l in self._listeners:
+                    l.addBlock(values, tstamps)
+            threshold, reader = self._flushThreshold, self._flushReader
+            if threshold and reader is not None and reader.available() >= threshold:
+                self._flushEvent.set()
+
+    def reader(self, oldest=False):
+        '''
+        Method to register a new reader of the samples (broadcast mode)
+
+        Args:
+            oldest (boolean) : Start from the oldest sample kept instead of the next one
+
+        Returns:
+            A RingReader, see RingBuffer.
+        '''
+        if self._ring is None:
+            raise RuntimeError("The container is not in broadcast mode")
+        return self._ring.reader(oldest)
+
+    def getStats(self):
+        '''
+        Running statistics of all the samples added to the container
+
+        The statistics include the samples already taken by getMeasures.
+        This method doesn't lock the container nor remove any sample, so it
+        can be called at any rate while measuring.
+
+        Returns:
+            A Stats tuple (count, mean, variance, min, max, last, last_tstamp).
+        '''
+        return self._stats.snapshot
+
+    def addListener(self, listener):
+        '''
+        Method to register an object that follows the samples as they are added
+
+        The listener must have the methods add(value, tstamp) and
+        addBlock(values, tstamps), with the same semantics as RunningStats.
+        They are called with the container locked, so they must be fast.
+
+        Args:
+            listener : The object to be updated (i.e. OnlineStability)
+        '''
+        with self._lock:
+            self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        '''
+        Method to unregister a listener (see addListener)
+        '''
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def _waitSpace(self, needed=1):
+        '''
+        Make free space in the container following the policy (lock must be held)
+
+        Args:
+            needed (int) : Number of samples to be added
+
+        Returns:
+            The number of samples that can be added, 0 if they must be dropped.
+        '''
+        if self._size <= 0:
+            return self._chunksize
+        if self._policy == "spill":
+            if self._count - self._onDisk - self._spilling >= self._size:
+                self._spill()
+            return self._chunksize
+        if self._policy == "drop_oldest":
+            over = self._count + min(needed, self._size) - self._size
+            if over > 0:
+                self._discard(over)
+            return self._size - self._count
+        if self._policy == "drop_newest":
+            return self._size - self._count
+        deadline = time.monotonic() + self._timeout
+        while self._count >= self._size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._lock.wait(remaining):
+                if self._count >= self._size:
+                    raise ContainerFull(message="No more space available",
+                    size=self._size, other=None)
+        return self._size - self._count
+
+    def _discard(self, count):
+        '''
+        Remove the count oldest samples (lock must be held)
+        '''
+        left = count
+        while left > 0:
+            head = self._chunks[0]
+            k = min(left, head.end - head.start)
+            head.start += k
+            left -= k
+            if isinstance(head, _SpilledChunk):
+                self._onDisk -= k
+                if head.start == head.end:
+                    self._chunks.popleft()
+            elif head.start == len(head.values):
+                self._chunks.popleft()
+        self._count -= count
+        self.dropped += count
+        logging.debug("%d samples dropped, the container is full" % count)
+
+    def _spill(self):
+        '''
+        Move the newest complete chunks to the spill file until the samples
+        in memory fit in the container (lock must be held)
+
+        The lock is released while a chunk is written, so the readers aren't
+        blocked by the file. The chunk stays in memory (and can be read)
+        until it's written, each one has its own region of the file.
+        '''
+        if self._spillFile is None:
+            # Unbuffered, the writes (os.pwrite) don't go through the file object
+            self._spillFile = tempfile.TemporaryFile(prefix="measdata", dir=self._spillDir,
+                                                     buffering=0)
+        fd = self._spillFile.fileno()
+        # The first chunk is being read and the last one is being written
+        i = len(self._chunks) - 2
+        while i > 0 and self._count - self._onDisk - self._spilling >= self._size:
+            chunk = self._chunks[i]
+            i -= 1
+            if not isinstance(chunk, _Chunk) or chunk in self._writing:
+                continue
+            start, n = chunk.start, chunk.end - chunk.start
+            offset = self._spillEnd
+            self._spillEnd += 16 * n
+            self._spilling += n
+            self._writing.add(chunk)
+            self._lock.release()
+            try:
+                self._pwrite(fd, memoryview(chunk.values)[start:chunk.end], offset)
+                self._pwrite(fd, memoryview(chunk.tstamps)[start:chunk.end], offset + 8 * n)
+            finally:
+                self._lock.acquire()
+                self._spilling -= n
+                self._writing.discard(chunk)
+            # The readers may have taken some samples of the chunk meanwhile
+            try:
+                i = self._chunks.index(chunk)
+            except ValueError:
+                i = len(self._chunks) - 2
+                continue
+            spilled = self._chunks[i] = _SpilledChunk(offset, n)
+            spilled.start = chunk.start - start
+            self._onDisk += spilled.end - spilled.start
+            self.spilled += spilled.end - spilled.start
+            i -= 1
+
+    @staticmethod
+    def _pwrite(fd, data, offset):
+        '''
+        Write all the bytes of data at offset, without moving the file position
+        '''
+        data = data.cast("B")
+        while data:
+            k = os.pwrite(fd, data, offset)
+            data = data[k:]
+            offset += k
+
+    def _pageIn(self, spilled):
+        '''
+        Read back the samples of a spilled chunk (lock must be held)
+
+        Returns:
+            A _Chunk with the samples not read yet.
+        '''
+        n = spilled.end - spilled.start
+        chunk = _Chunk(n)
+        f = self._spillFile
+        f.seek(spilled.offset + 8 * spilled.start)
+        f.readinto(memoryview(chunk.values).cast("B"))
+        f.seek(spilled.offset + 8 * (spilled.size + spilled.start))
+        f.readinto(memoryview(chunk.tstamps).cast("B"))
+        chunk.end = n
+        self._onDisk -= n
+        if self._onDisk == 0 and not self._writing:
+            # Nothing else in the file, reuse it from the beginning
+            f.truncate(0)
+            self._spillEnd = 0
+        return chunk
+
+    @staticmethod
+    def _column(src, start, count):
+        '''
+        Take count values from src as an array('d') ready to be copied
+        '''
+        if isinstance(src, array) and src.typecode == "d":
+            if start == 0 and count == len(src):
+                return src
+            return src[start:start + count]
         try:
-            if tstamp is None:
-                self._queue.put((meas), timeout=self._timeout)
-            else : self._queue.put((meas, tstamp), timeout=self._timeout)
-        except queue.Full as e:
-            raise ContainerFull(message="No more space available",
-            size=self._queue.maxsize, other=e)
+            # Any contiguous buffer of doubles (memoryview, numpy.ndarray, ...)
+            view = memoryview(src)
+            if view.format == "d" and view.ndim == 1 and view.c_contiguous:
+                col = array("d")
+                col.frombytes(view[start:start + count].cast("B"))
+                return col
+        except TypeError:
+            pass
+        return array("d", src[start:start + count])
 
-    def getMeasures(self, count=1):
+    def getMeasures(self, count=1, asarray=False):
         '''
         Take the last _count_ measures from the buffer
 
         Args:
             count (int) : How many values take from the buffer
+            asarray (boolean) : Return the values and the timestamps as arrays
 
         Returns:
-            A list with the measured values from the instrument
+            A list with the measured values from the instrument. Each item is
+            a float or a tuple (value, timestamp) when it has a timestamp.
+            If asarray is True, it returns a tuple of two read-only memoryviews
+            (values, timestamps) of 64 bits floats. When the samples are
+            contiguous in the storage, they are views of it (no copy is done).
+
+        Raises:
+            ContainerEmpty if there are less than count samples.
+            ReaderOverrun in broadcast mode, when samples were overwritten
+            before being taken.
         '''
-        ret_buf = []
-        if count > self._queue.qsize():
-            raise ContainerEmpty(message="No more data is ready to be fetch",
-            available=self._queue.qsize(), requested=count)
-        ret_buf = [self._queue.get(timeout=self._timeout) for i in range(count)]
+        if self._ring is not None:
+            values, tstamps = self._reader.take(count)
+        else:
+            values, tstamps = self._takeChunks(count)
+        if asarray:
+            return values, tstamps
+        return [v if ts != ts else (v, ts) for v, ts in zip(values, tstamps)]
 
-        return ret_buf
+    def _takeChunks(self, count):
+        '''
+        Remove count samples from the chunks
 
-    def flushToFile(self, ofile="output.dat"):
+        Returns:
+            A tuple of two read-only memoryviews (values, timestamps).
+        '''
+        with self._lock:
+            if count > self._count:
+                raise ContainerEmpty(message="No more data is ready to be fetch",
+                available=self._count, requested=count)
+            parts = []
+            left = count
+            while left > 0:
+                head = self._chunks[0]
+                if isinstance(head, _SpilledChunk):
+                    head = self._chunks[0] = self._pageIn(head)
+                k = min(left, head.end - head.start)
+                parts.append((head, head.start, head.start + k))
+                head.start += k
+                left -= k
+                if head.start == len(head.values):
+                    self._chunks.popleft()
+            self._count -= count
+            self._lock.notify_all()
+
+        if len(parts) == 1:
+            chunk, a, b = parts[0]
+            values = memoryview(chunk.values)[a:b]
+            tstamps = memoryview(chunk.tstamps)[a:b]
+        else:
+            values = array("d")
+            tstamps = array("d")
+            for chunk, a, b in parts:
+                values.extend(chunk.values[a:b])
+                tstamps.extend(chunk.tstamps[a:b])
+            values = memoryview(values)
+            tstamps = memoryview(tstamps)
+        return values.toreadonly(), tstamps.toreadonly()
+
+    def flushToFile(self, ofile="output.dat", binary=False, header=None):
         '''
         Method to save all the content of the buffer to a file
 
         The output format is:
         <value in E notation>, <timestamp>
 
+        Or the binary format when binary is set (see misc.measured_file).
+
         Args:
             ofile (str) : Name of the output file
+            binary (boolean) : Use the binary format
+            header (dict) : Header fields for new binary files (instrument, config, units)
         '''
-        if self._queue.qsize() == 0:
+        count = len(self)
+        if count == 0:
             raise BufferSaved()
 
-        with open(ofile, 'a') as f:
-            meas = self.getMeasures(self._queue.qsize())
-            for i in meas:
-                out = str(i)[1:-1] if type(i) is tuple else str(i)
-                f.write("%s\n" % (out))
+        with self._openFile(ofile, binary, header) as f:
+            self._writeFile(f, count)
+
+    @staticmethod
+    def _openFile(ofile, binary, header):
+        '''
+        Open an output file for appending samples
+        '''
+        if binary:
+            return MeasFileWriter(ofile, **(header or {}))
+        return open(ofile, 'a')
+
+    def _writeFile(self, f, count, reader=None):
+        '''
+        Write count samples to an open file (text or MeasFileWriter)
+
+        Args:
+            f (file) : The output file
+            count (int) : Number of samples to be written
+            reader (RingReader) : Cursor used to take the samples, None for getMeasures
+
+        Returns:
+            The number of samples written.
+        '''
+        if count == 0:
+            return 0
+        if reader is None:
+            values, tstamps = self.getMeasures(count, asarray=True)
+        else:
+            first = reader.cursor
+            # The producer doesn't wait for the writer, so the views of the
+            # ring could be overwritten while they are written
+            values, tstamps = reader.take(count, copy=True)
+        try:
+            if isinstance(f, MeasFileWriter):
+                f.write(values, tstamps)
+            else:
+                self._writeText(f, values, tstamps)
+        except Exception:
+            # Keep the samples for the next write
+            if reader is None:
+                self._putBack(values, tstamps)
+            else:
+                reader.cursor = first
+            raise
+        return count
+
+    def _putBack(self, values, tstamps):
+        '''
+        Return samples taken with getMeasures to the head of the container
+        '''
+        chunk = _Chunk(0)
+        chunk.values = array("d", values.tobytes())
+        chunk.tstamps = array("d", tstamps.tobytes())
+        chunk.end = len(chunk.values)
+        with self._lock:
+            self._chunks.appendleft(chunk)
+            self._count += chunk.end
+
+    def _writeText(self, f, values, tstamps):
+        '''
+        Write samples to an open file in a single writelines call
+
+        Args:
+            f (file) : The output file
+            values (sequence) : The values to be written
+            tstamps (sequence) : Their timestamps
+        '''
+        f.writelines(["%s\n" % v if ts != ts else "%s, %s\n" % (v, ts)
+                      for v, ts in zip(values, tstamps)])
+
+    def startFlusher(self, ofile="output.dat", period=10, threshold=100000, fsync_period=60,
+                     binary=False, header=None):
+        '''
+        Method to start a thread that saves the content of the buffer to a file
+
+        The thread wakes up every "period" seconds, or before that when there
+        are "threshold" samples in the buffer, and appends all the samples to
+        the file (same format as flushToFile). So the memory used by long
+        captures stays bounded. In broadcast mode, the thread reads with its
+        own cursor, starting from the oldest sample kept. When a write
+        fails, the samples are kept for the next one.
+
+        It's a daemon thread, so it doesn't keep the program running: call
+        stopFlusher (i.e. in a finally block) to write the last samples.
+
+        Args:
+            ofile (str) : Name of the output file
+            period (float) : Max. time (s) between writes
+            threshold (int) : Number of samples that triggers a write (0 to disable)
+            fsync_period (float) : Min. time (s) between fsync calls (None to disable)
+            binary (boolean) : Use the binary format (see flushToFile)
+            header (dict) : Header fields for new binary files
+        '''
+        if self._flusher is not None:
+            raise RuntimeError("The flusher thread is already running")
+        with self._lock:
+            if self._ring is not None:
+                self._flushReader = self._ring.reader(oldest=True)
+            self._flushThreshold = threshold
+        self._flushStop.clear()
+        self._flushEvent.clear()
+        self._flusher = threading.Thread(target=self._flushLoop,
+                        args=(self._openFile(ofile, binary, header), period, fsync_period),
+                        name="MeasuredData flusher", daemon=True)
+        self._flusher.start()
+
+    def stopFlusher(self, timeout=None):
+        '''
+        Method to stop the flusher thread
+
+        The samples still in the buffer are written and the file is closed.
+        If the thread is still writing when the timeout expires, it's kept
+        as running (call this method again to wait for it).
+
+        Args:
+            timeout (float) : Max. time (s) waiting for the thread
+
+        Returns:
+            True if the thread has stopped.
+        '''
+        if self._flusher is None:
+            return True
+        self._flushStop.set()
+        self._flushEvent.set()
+        self._flusher.join(timeout)
+        if self._flusher.is_alive():
+            return False
+        self._flusher = None
+        with self._lock:
+            self._flushThreshold = 0
+            self._flushReader = None
+        return True
+
+    def _flushPending(self, f):
+        '''
+        Write the samples not saved yet by the flusher thread
+
+        Returns:
+            The number of samples written.
+        '''
+        reader = self._flushReader
+        if reader is None:
+            return self._writeFile(f, self._count)
+        try:
+            return self._writeFile(f, reader.available(), reader)
+        except ReaderOverrun as e:
+            logging.warning("The flusher lost %d samples" % e.lost)
+            return self._writeFile(f, reader.available(), reader)
+
+    def _flushLoop(self, f, period, fsync_period):
+        '''
+        Body of the flusher thread, the file is closed when it ends
+        '''
+        last_sync = time.monotonic()
+        with f:
+            while True:
+                self._flushEvent.wait(period)
+                self._flushEvent.clear()
+                stop = self._flushStop.is_set()
+                try:
+                    written = self._flushPending(f)
+                except Exception as e:
+                    logging.error("Unable to save the measures: %s" % str(e))
+                    written = 0
+                if written and fsync_period is not None and \
+                   (stop or time.monotonic() - last_sync >= fsync_period):
+                    f.flush()
+                    os.fsync(f.fileno())
+                    last_sync = time.monotonic()
+                if stop:
+                    break
@@ -0,0 +1,268 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Binary file format for the measured values from the instruments.
+
+The file starts with a fixed size header (HEADER_SIZE bytes): the magic
+string followed by a JSON dictionary with the instrument, the configuration
+used and the units, padded with spaces. After the header, the samples are
+appended as records of two little-endian 64 bits floats (value, timestamp).
+A timestamp set to NaN means that the sample has no timestamp.
+
+The reader maps the file in memory, so the columns are returned without
+reading or parsing the file.
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import os
+import sys
+import math
+import mmap
+import json
+from array import array
+
+## Identifier at the beginning of the files
+MAGIC = b"MEASDAT1"
+## Size (bytes) of the header, records start at this offset
+HEADER_SIZE = 512
+## Size (bytes) of each record (value, timestamp)
+RECORD_SIZE = 16
+
+def _column(src):
+    '''
+    Get a sequence of floats as an array('d')
+    '''
+    if isinstance(src, array) and src.typecode == "d":
+        return src
+    if isinstance(src, memoryview) and src.format == "d" and src.c_contiguous:
+        col = array("d")
+        col.frombytes(src.cast("B"))
+        return col
+    return array("d", src)
+
+class MeasFileWriter():
+    '''
+    Class to append samples to a binary measurement file.
+
+    If the file doesn't exist (or it's empty), the header is written first.
+    Otherwise, the samples are appended after the existing ones.
+    '''
+
+    def __init__(self, ofile, instrument="", config="", units=("s", "s")):
+        '''
+        Constructor
+
+        Args:
+            ofile (str) : Name of the output file
+            instrument (str) : Instrument used to take the samples
+            config (str) : Configuration of the measurement
+            units (tuple) : Units of the values and the timestamps
+        '''
+        self._file = open(ofile, "ab")
+        if self._file.tell() == 0:
+            header = {"version": 1, "instrument": instrument, "config": config,
+                      "units": list(units)}
+            raw = MAGIC + json.dumps(header).encode()
+            if len(raw) >= HEADER_SIZE:
+                self._file.close()
+                raise ValueError("Header too long (%d bytes)" % len(raw))
+            self._file.write(raw.ljust(HEADER_SIZE - 1) + b"\n")
+        else:
+            with open(ofile, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    self._file.close()
+                    raise ValueError("%s is not a binary measurement file" % ofile)
+            # Drop an incomplete record (i.e. after a crash)
+            extra = (self._file.tell() - HEADER_SIZE) % RECORD_SIZE
+            if extra:
+                self._file.truncate(self._file.tell() - extra)
+                self._file.seek(0, os.SEEK_END)
+
+    def write(self, values, tstamps=None):
+        '''
+        Method to append samples to the file
+
+        Args:
+            values (sequence) : The measured values
+            tstamps (sequence) : The timestamps, None if there aren't
+        '''
+        n = len(values)
+        if n == 0:
+            return
+        records = array("d", bytes(RECORD_SIZE * n))
+        records[0::2] = _column(values)
+        if tstamps is None:
+            records[1::2] = array("d", (math.nan,)) * n
+        else:
+            records[1::2] = _column(tstamps)
+        if sys.byteorder != "little":
+            records.byteswap()
+        self._file.write(records)
+
+    def flush(self):
+        '''
+        Method to flush the buffered samples to the file
+        '''
+        self._file.flush()
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+class MeasFile():
+    '''
+    Class to read a binary measurement file.
+
+    The file is mapped in memory. The values and timestamps columns are
+    memoryviews of the mapping (no data is copied on little-endian hosts),
+    and they can be sliced or passed to numpy.asarray without copies.
+    The file must be closed after releasing the views.
+    '''
+
+    def __init__(self, ifile):
+        '''
+        Constructor
+
+        Args:
+            ifile (str) : Name of the input file
+
+        Raises:
+            ValueError if the file isn't a binary measurement file.
+        '''
+        self._file = open(ifile, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER_SIZE:
+            self._file.close()
+            raise ValueError("%s is not a binary measurement file" % ifile)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError("%s is not a binary measurement file" % ifile)
+        ## Dictionary with the header fields
+        self.header = json.loads(self._map[len(MAGIC):HEADER_SIZE].decode())
+
+        # Ignore an incomplete record at the end
+        n = (size - HEADER_SIZE) // RECORD_SIZE
+        records = memoryview(self._map)[HEADER_SIZE:HEADER_SIZE + n * RECORD_SIZE]
+        if sys.byteorder == "little":
+            records = records.cast("d")
+        else:
+            swapped = array("d")
+            swapped.frombytes(records)
+            swapped.byteswap()
+            records = memoryview(swapped)
+        self._records = records
+        ## Column with the measured values
+        self.values = records[0::2]
+        ## Column with the timestamps
+        self.tstamps = records[1::2]
+
+    def __len__(self):
+        return len(self.values)
+
+    def close(self):
+        '''
+        Method to close the file, the columns can't be used after it
+        '''
+        if hasattr(self, "_records"):
+            self.values.release()
+            self.tstamps.release()
+            self._records.release()
+            del self._records
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+def textToBinary(ifile, ofile, instrument="", config="", units=("s", "s"), chunk=65536):
+    '''
+    Convert a text measurement file (see MeasuredData.flushToFile) to the binary format
+
+    Args:
+        ifile (str) : Name of the input (text) file
+        ofile (str) : Name of the output (binary) file
+        instrument (str) : Instrument used to take the samples
+        config (str) : Configuration of the measurement
+        units (tuple) : Units of the values and the timestamps
+        chunk (int) : Number of lines converted at once
+
+    Returns:
+        The number of samples converted.
+    '''
+    total = 0
+    with open(ifile, "r") as f, MeasFileWriter(ofile, instrument, config, units) as w:
+        values = array("d")
+        tstamps = array("d")
+        for line in f:
+            line = line.strip()
+            if line == "":
+                continue
+            fields = line.split(",")
+            values.append(float(fields[0]))
+            tstamps.append(float(fields[1]) if len(fields) > 1 else math.nan)
+            if len(values) == chunk:
+                w.write(values, tstamps)
+                total += len(values)
+                values = array("d")
+                tstamps = array("d")
+        w.write(values, tstamps)
+        total += len(values)
+    return total
+
+def binaryToText(ifile, ofile, chunk=65536):
+    '''
+    Convert a binary measurement file to the text format (see MeasuredData.flushToFile)
+
+    Args:
+        ifile (str) : Name of the input (binary) file
+        ofile (str) : Name of the output (text) file
+        chunk (int) : Number of samples converted at once
+
+    Returns:
+        The number of samples converted.
+    '''
+    with MeasFile(ifile) as m, open(ofile, "a") as f:
+        for i in range(0, len(m), chunk):
+            values = m.values[i:i + chunk]
+            tstamps = m.tstamps[i:i + chunk]
+            f.writelines(["%s\n" % v if ts != ts else "%s, %s\n" % (v, ts)
+                          for v, ts in zip(values, tstamps)])
+            values.release()
+            tstamps.release()
+        return len(m)
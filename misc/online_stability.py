@@ -0,0 +1,188 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Online (incremental) ADEV/TDEV estimator.
+
+The estimator follows a capture sample by sample (see
+MeasuredData.addListener) and the current stability curve can be queried
+at any time, without waiting for the end of the capture.
+
+For each octave tau = 2^k * tau0 it keeps the decimated phase (one sample
+every 2^k) and the averages of the phase over blocks of 2^k samples, both
+built from the previous level. The second differences of these streams
+give non-overlapped estimates of the Allan variance and of the modified
+Allan variance (so the TDEV). Each level only holds a few numbers, so the
+memory is O(log N) and the cost is O(1) per sample (amortized).
+
+The results are less confident than the overlapped estimators of
+misc.stability, which should be used over the saved data.
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import math
+import collections
+
+## A point of the stability curve: tau (s), ADEV, TDEV and number of terms of each one
+OnlinePoint = collections.namedtuple("OnlinePoint", ["tau", "adev", "tdev", "n_adev", "n_tdev"])
+
+class _Level():
+    '''
+    Accumulators for an octave tau = 2^k * tau0
+    '''
+    __slots__ = ("x1", "x2", "b1", "b2", "sum_x", "n_x", "sum_b", "n_b", "px", "pb")
+
+    def __init__(self):
+        # Last two samples of the decimated phase and of the block averages
+        self.x1 = self.x2 = None
+        self.b1 = self.b2 = None
+        # Sum of the squared second differences and number of terms
+        self.sum_x = 0.0
+        self.n_x = 0
+        self.sum_b = 0.0
+        self.n_b = 0
+        # First sample of the pair that feeds the next level
+        self.px = None
+        self.pb = None
+
+    def update(self, x, b):
+        if self.x2 is not None:
+            d = x - 2.0 * self.x1 + self.x2
+            self.sum_x += d * d
+            self.n_x += 1
+            d = b - 2.0 * self.b1 + self.b2
+            self.sum_b += d * d
+            self.n_b += 1
+        self.x2, self.x1 = self.x1, x
+        self.b2, self.b1 = self.b1, b
+
+class OnlineStability():
+    '''
+    Incremental ADEV/TDEV estimator over octave taus.
+
+    Usage:
+        est = OnlineStability(tau0=1.0)
+        data.addListener(est)
+        ...
+        for p in est.getCurve() : print(p.tau, p.adev, p.tdev)
+    '''
+
+    def __init__(self, tau0=1.0, data_type="phase", f0=0, max_levels=40):
+        '''
+        Constructor
+
+        Args:
+            tau0 (float) : Sampling period (s)
+            data_type (str) : "phase" for time interval samples (s) or "freq"
+                              for frequency samples
+            f0 (float) : Nominal frequency (Hz) of the "freq" samples, 0 if
+                         they are fractional frequency (as freqToPhase in
+                         misc.stability, but the mean can't be used here)
+            max_levels (int) : Max. number of octaves
+        '''
+        if data_type not in ("phase", "freq"):
+            raise ValueError("Unknown data type: %s" % data_type)
+        if data_type == "freq" and f0 is None:
+            raise ValueError("The nominal frequency is needed for the \"freq\" samples")
+        self.tau0 = tau0
+        self._freq = data_type == "freq"
+        self._f0 = f0
+        self._max = max_levels
+        self._levels = []
+        ## Phase integrated from the frequency samples
+        self._phase = 0.0
+        ## Number of samples
+        self.count = 0
+
+    def add(self, x, ts=math.nan):
+        '''
+        Add a sample
+
+        Args:
+            x (float) : The sample (phase or frequency)
+            ts (float) : Its timestamp, not used
+        '''
+        if self._freq:
+            y = x if self._f0 == 0 else (x - self._f0) / self._f0
+            # The first phase sample is 0, the next ones integrate the frequency
+            if self.count == 0:
+                self._feed(0.0)
+            self._phase += y * self.tau0
+            x = self._phase
+        self._feed(x)
+        self.count += 1
+
+    def addBlock(self, values, tstamps=None):
+        '''
+        Add a block of samples
+
+        Args:
+            values (sequence) : The samples
+            tstamps (sequence) : Their timestamps, not used
+        '''
+        for x in values:
+            self.add(x)
+
+    def _feed(self, x):
+        '''
+        Push a phase sample through the levels
+        '''
+        b = x
+        k = 0
+        while True:
+            if k == len(self._levels):
+                if k == self._max:
+                    return
+                self._levels.append(_Level())
+            lvl = self._levels[k]
+            lvl.update(x, b)
+            if lvl.px is None:
+                lvl.px, lvl.pb = x, b
+                return
+            # The next level takes the first phase sample of the pair and
+            # the average of both blocks
+            x, b = lvl.px, 0.5 * (lvl.pb + b)
+            lvl.px = lvl.pb = None
+            k += 1
+
+    def getCurve(self):
+        '''
+        Method to get the current estimation of the stability curve
+
+        It can be called from another thread while the samples are added.
+
+        Returns:
+            A list of OnlinePoint, one for each octave with enough samples.
+        '''
+        curve = []
+        for k, lvl in enumerate(list(self._levels)):
+            n_x, sum_x, n_b, sum_b = lvl.n_x, lvl.sum_x, lvl.n_b, lvl.sum_b
+            if n_x == 0:
+                break
+            tau = (2 ** k) * self.tau0
+            adev = math.sqrt(sum_x / (2.0 * n_x)) / tau
+            # TDEV = tau * MDEV / sqrt(3), with MVAR = <d^2> / (2 tau^2)
+            tdev = math.sqrt(sum_b / (6.0 * n_b))
+            curve.append(OnlinePoint(tau, adev, tdev, n_x, n_b))
+        return curve
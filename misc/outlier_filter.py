@@ -0,0 +1,195 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Streaming outlier rejection for the measured values.
+
+OutlierFilter is placed between the acquisition loop of an instrument and
+the data container (it has the same addMeasures method as MeasuredData).
+Each sample is compared with the median of the last samples (accepted or
+not, so a real step of the signal is followed once it fills half of the
+window). A sample is rejected when it's farther from the median than:
+ - "window" : A fixed limit, i.e. the error attribute of the counters.
+ - "mad" : nsigma times the robust standard deviation (1.4826 * MAD) of
+   the window. The MAD is refreshed once per window, so the cost of each
+   sample is a binary search and an insertion in a small sorted list.
+
+The rejected samples are counted and, optionally, added to a side
+container instead of being dropped.
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import math
+import numbers
+import bisect
+import logging
+import collections
+from array import array
+
+## Scale factor from the MAD to the standard deviation of a normal distribution
+MAD_SCALE = 1.4826
+
+class OutlierFilter():
+    '''
+    Filter stage that drops the samples far from the rolling median.
+
+    Usage:
+        datos = MeasuredData()
+        filt = OutlierFilter(datos, method="window", limit=500e-9)
+        device.timeInterval(cfg_str, filt)
+    '''
+
+    def __init__(self, sink, method="mad", window=64, limit=None, nsigma=5.0,
+                 rejected=None, min_samples=8):
+        '''
+        Constructor
+
+        Args:
+            sink : Container for the accepted samples (i.e. MeasuredData)
+            method (str) : "mad" or "window", see the module description
+            window (int) : Number of samples used for the median
+            limit (float) : Max. distance to the median for "window", or min.
+                            value of the threshold for "mad" (same units as
+                            the samples)
+            nsigma (float) : Threshold in robust standard deviations for "mad"
+            rejected : Container for the rejected samples, None to drop them
+            min_samples (int) : Samples needed before rejecting anything
+        '''
+        if method not in ("mad", "window"):
+            raise ValueError("Unknown filter method: %s" % method)
+        if method == "window" and limit is None:
+            raise ValueError("The window method needs a limit")
+        if window < 3:
+            raise ValueError("Window too small (%d)" % window)
+        self._sink = sink
+        self._rejectedOut = rejected
+        self.method = method
+        self.window = window
+        self.limit = limit
+        self.nsigma = nsigma
+        self.min_samples = max(min_samples, 3)
+        # Samples in arrival order and sorted
+        self._fifo = collections.deque()
+        self._sorted = []
+        # Threshold of the "mad" method and samples until it's refreshed
+        self._threshold = math.inf
+        self._refresh = 0
+        ## Number of accepted samples
+        self.accepted = 0
+        ## Number of rejected samples
+        self.rejected = 0
+
+    def _median(self):
+        s = self._sorted
+        n = len(s)
+        h = n // 2
+        return s[h] if n & 1 else 0.5 * (s[h - 1] + s[h])
+
+    def _updateThreshold(self, med):
+        '''
+        Compute the threshold of the "mad" method from the current window
+        '''
+        dev = sorted(abs(v - med) for v in self._sorted)
+        n = len(dev)
+        h = n // 2
+        mad = dev[h] if n & 1 else 0.5 * (dev[h - 1] + dev[h])
+        thr = self.nsigma * MAD_SCALE * mad
+        # Quantized readings can give a null MAD
+        if self.limit is not None:
+            thr = max(thr, self.limit)
+        self._threshold = thr
+        self._refresh = self.window
+
+    def check(self, x):
+        '''
+        Method to classify a sample and add it to the window
+
+        Args:
+            x (float) : The sample
+
+        Returns:
+            True if the sample is accepted.
+        '''
+        ok = True
+        if len(self._sorted) >= self.min_samples:
+            med = self._median()
+            if self.method == "window":
+                thr = self.limit
+            else:
+                if self._refresh <= 0:
+                    self._updateThreshold(med)
+                self._refresh -= 1
+                thr = self._threshold
+            ok = abs(x - med) <= thr
+
+        # Every sample enters the window
+        self._fifo.append(x)
+        bisect.insort(self._sorted, x)
+        if len(self._fifo) > self.window:
+            old = self._fifo.popleft()
+            del self._sorted[bisect.bisect_left(self._sorted, old)]
+        return ok
+
+    def addMeasures(self, meas, tstamp=None):
+        '''
+        Method to filter new measures and pass them to the containers
+
+        Args:
+            meas (float or sequence) : A new measure or a sequence of measures
+            tstamp (float or sequence) : Timestamp value for the measure(s)
+        '''
+        if isinstance(meas, numbers.Real):
+            if self.check(meas):
+                self.accepted += 1
+                self._sink.addMeasures(meas, tstamp)
+            else:
+                self.rejected += 1
+                logging.debug("Sample rejected: %s" % meas)
+                if self._rejectedOut is not None:
+                    self._rejectedOut.addMeasures(meas, tstamp)
+            return
+
+        n = len(meas)
+        if tstamp is None:
+            tstamp = array("d", (math.nan,)) * n
+        elif len(tstamp) != n:
+            raise ValueError("Different number of measures (%d) and timestamps (%d)"
+                             % (n, len(tstamp)))
+        good_v, good_ts = array("d"), array("d")
+        bad_v, bad_ts = array("d"), array("d")
+        for x, ts in zip(meas, tstamp):
+            if self.check(x):
+                good_v.append(x)
+                good_ts.append(ts)
+            else:
+                bad_v.append(x)
+                bad_ts.append(ts)
+        self.accepted += len(good_v)
+        self.rejected += len(bad_v)
+        if good_v:
+            self._sink.addMeasures(good_v, good_ts)
+        if bad_v:
+            logging.debug("%d samples rejected" % len(bad_v))
+            if self._rejectedOut is not None:
+                self._rejectedOut.addMeasures(bad_v, bad_ts)
@@ -0,0 +1,287 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Frequency/time stability analysis of the measured data.
+
+This module computes the overlapping Allan deviation (ADEV), the modified
+Allan deviation (MDEV), the time deviation (TDEV) and the maximum time
+interval error (MTIE) of a series of samples. The input is phase data
+(time interval measurements in seconds, i.e. PPS skew) or fractional
+frequency data, see freqToPhase for absolute frequency readings.
+
+All the estimators are vectorized with numpy: ADEV and MDEV are computed
+with O(N) operations for each tau (MDEV from the cumulative sum of the phase)
+and MTIE uses a sparse table of sliding max./min. (O(N log N) for an octave
+grid instead of O(N^2)).
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+'''
+
+#------------------------------------------------------------------------------|
+#                   GNU LESSER GENERAL PUBLIC LICENSE                          |
+#                 ------------------------------------                         |
+# This source file is free software; you can redistribute it and/or modify it  |
+# under the terms of the GNU Lesser General Public License as published by the |
+# Free Software Foundation; either version 2.1 of the License, or (at your     |
+# option) any later version. This source is distributed in the hope that it    |
+# will be useful, but WITHOUT ANY WARRANTY; without even the implied warrant   |
+# of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU Lesser   |
+# General Public License for more details. You should have received a copy of  |
+# the GNU Lesser General Public License along with this  source; if not,       |
+# download it from http://www.gnu.org/licenses/lgpl-2.1.html                   |
+#------------------------------------------------------------------------------|
+
+#-------------------------------------------------------------------------------
+#                                   Import                                    --
+#-------------------------------------------------------------------------------
+# Import system modules
+import collections
+import numpy as np
+
+# User modules
+from misc.measured_file import MeasFile
+
+## Result of an estimator: averaging times (s), deviations and number of terms
+Stability = collections.namedtuple("Stability", ["taus", "devs", "n"])
+
+def loadSeries(src):
+    '''
+    Get a series of samples as a numpy array
+
+    Args:
+        src : A binary measurement file (str), the (values, timestamps) tuple
+              returned by MeasuredData.getMeasures(asarray=True) or any
+              sequence/buffer of floats.
+
+    Returns:
+        A tuple (values, timestamps) of numpy arrays (timestamps may be None).
+    '''
+    if isinstance(src, str):
+        with MeasFile(src) as m:
+            values = np.array(m.values, dtype=float)
+            tstamps = np.array(m.tstamps, dtype=float)
+    elif isinstance(src, tuple) and len(src) == 2:
+        values = np.asarray(src[0], dtype=float)
+        tstamps = None if src[1] is None else np.asarray(src[1], dtype=float)
+    else:
+        values = np.asarray(src, dtype=float)
+        tstamps = None
+    if tstamps is not None and np.isnan(tstamps).all():
+        tstamps = None
+    return values, tstamps
+
+def estimateTau0(tstamps, default=1.0):
+    '''
+    Estimate the sampling period from the timestamps (median of the differences)
+
+    Args:
+        tstamps (array) : Timestamps (s), or None
+        default (float) : Value returned when there are no timestamps
+
+    Returns:
+        The sampling period (s).
+    '''
+    if tstamps is None or len(tstamps) < 2:
+        return default
+    dt = np.diff(tstamps)
+    dt = dt[np.isfinite(dt)]
+    return float(np.median(dt)) if len(dt) else default
+
+def freqToPhase(freq, tau0, f0=None):
+    '''
+    Convert frequency data to phase data
+
+    Args:
+        freq (array) : Absolute frequency readings (Hz), or fractional frequency if f0 is 0
+        tau0 (float) : Sampling period (s)
+        f0 (float) : Nominal frequency (Hz), the mean value if None
+
+    Returns:
+        The phase (time error, s) as a numpy array of len(freq) + 1 samples.
+    '''
+    freq = np.asarray(freq, dtype=float)
+    if f0 == 0:
+        y = freq
+    else:
+        if f0 is None:
+            f0 = freq.mean()
+        y = (freq - f0) / f0
+    x = np.empty(len(y) + 1)
+    x[0] = 0.0
+    np.cumsum(y * tau0, out=x[1:])
+    return x
+
+def tauGrid(n, kind="octave", maxm=None):
+    '''
+    Averaging factors (m, tau = m * tau0) for a series
+
+    Args:
+        n (int) : Number of phase samples
+        kind (str or sequence) : "octave" (1, 2, 4...), "decade" (1, 2, 4, 10, 20, 40...),
+                                 "all" (every m) or an explicit sequence of m
+        maxm (int) : Max. averaging factor
+
+    Returns:
+        A numpy array of integers.
+    '''
+    if maxm is None:
+        maxm = n - 1
+    if maxm < 1:
+        return np.zeros(0, dtype=np.int64)
+    if isinstance(kind, str):
+        if kind == "octave":
+            m = 2 ** np.arange(int(np.log2(maxm)) + 1)
+        elif kind == "decade":
+            dec = 10 ** np.arange(int(np.log10(maxm)) + 1)
+            m = np.unique(np.outer(dec, [1, 2, 4]).ravel())
+        elif kind == "all":
+            m = np.arange(1, maxm + 1)
+        else:
+            raise ValueError("Unknown tau grid: %s" % kind)
+    else:
+        m = np.unique(np.asarray(kind, dtype=np.int64))
+    m = m[(m >= 1) & (m <= maxm)]
+    return m.astype(np.int64)
+
+def _phase(data, tau0, data_type):
+    '''
+    Common input handling of the estimators
+    '''
+    values, tstamps = loadSeries(data)
+    if tau0 is None:
+        tau0 = estimateTau0(tstamps)
+    if data_type == "freq":
+        values = freqToPhase(values, tau0, f0=0)
+    elif data_type != "phase":
+        raise ValueError("Unknown data type: %s" % data_type)
+    return values, tau0
+
+def adev(data, tau0=None, taus="octave", data_type="phase"):
+    '''
+    Overlapping Allan deviation
+
+    Args:
+        data : Phase (s) or fractional frequency samples, see loadSeries
+        tau0 (float) : Sampling period (s), estimated from the timestamps if None
+        taus (str or sequence) : Averaging factors, see tauGrid
+        data_type (str) : "phase" or "freq"
+
+    Returns:
+        A Stability tuple.
+    '''
+    x, tau0 = _phase(data, tau0, data_type)
+    n = len(x)
+    ms = tauGrid(n, taus, (n - 1) // 2)
+    devs = np.empty(len(ms))
+    terms = np.empty(len(ms), dtype=np.int64)
+    buf = np.empty(n)
+    for i, m in enumerate(ms):
+        k = n - 2 * m
+        # Second differences, computed in place to avoid temporary arrays
+        d = np.add(x[2 * m:], x[:k], out=buf[:k])
+        d -= x[m:m + k]
+        d -= x[m:m + k]
+        terms[i] = k
+        devs[i] = np.sqrt(np.dot(d, d) / (2.0 * k)) / (m * tau0)
+    return Stability(ms * tau0, devs, terms)
+
+def mdev(data, tau0=None, taus="octave", data_type="phase"):
+    '''
+    Modified Allan deviation
+
+    The inner sums over m samples are taken from the cumulative sum of
+    the phase, so each tau costs O(N).
+
+    Args:
+        data : Phase (s) or fractional frequency samples, see loadSeries
+        tau0 (float) : Sampling period (s), estimated from the timestamps if None
+        taus (str or sequence) : Averaging factors, see tauGrid
+        data_type (str) : "phase" or "freq"
+
+    Returns:
+        A Stability tuple.
+    '''
+    x, tau0 = _phase(data, tau0, data_type)
+    n = len(x)
+    s = np.empty(n + 1)
+    s[0] = 0.0
+    # MDEV doesn't depend on a phase offset, removing it keeps the precision
+    np.cumsum(x - x.mean(), out=s[1:])
+    ms = tauGrid(n, taus, n // 3)
+    devs = np.empty(len(ms))
+    terms = np.empty(len(ms), dtype=np.int64)
+    buf = np.empty(n)
+    for i, m in enumerate(ms):
+        k = n - 3 * m + 1
+        # S[j+3m] - 3 S[j+2m] + 3 S[j+m] - S[j], computed in place
+        d = np.subtract(s[m:m + k], s[2 * m:2 * m + k], out=buf[:k])
+        d *= 3.0
+        d += s[3 * m:3 * m + k]
+        d -= s[:k]
+        terms[i] = k
+        devs[i] = np.sqrt(np.dot(d, d) / (2.0 * k)) / (m * m * tau0)
+    return Stability(ms * tau0, devs, terms)
+
+def tdev(data, tau0=None, taus="octave", data_type="phase"):
+    '''
+    Time deviation, TDEV(tau) = tau * MDEV(tau) / sqrt(3)
+
+    Args:
+        data : Phase (s) or fractional frequency samples, see loadSeries
+        tau0 (float) : Sampling period (s), estimated from the timestamps if None
+        taus (str or sequence) : Averaging factors, see tauGrid
+        data_type (str) : "phase" or "freq"
+
+    Returns:
+        A Stability tuple.
+    '''
+    r = mdev(data, tau0, taus, data_type)
+    return Stability(r.taus, r.taus * r.devs / np.sqrt(3.0), r.n)
+
+def mtie(data, tau0=None, taus="octave", data_type="phase"):
+    '''
+    Maximum time interval error
+
+    For each tau = m * tau0, the largest peak-to-peak phase variation within
+    any window of m + 1 samples. The max./min. of the windows are taken from
+    a sparse table: the level k holds the max./min. of every window of 2^k
+    samples and it's built from the level k - 1 in O(N). A window of any
+    length L is covered by two windows of the level floor(log2(L)).
+
+    Args:
+        data : Phase (s) or fractional frequency samples, see loadSeries
+        tau0 (float) : Sampling period (s), estimated from the timestamps if None
+        taus (str or sequence) : Averaging factors, see tauGrid
+        data_type (str) : "phase" or "freq"
+
+    Returns:
+        A Stability tuple.
+    '''
+    x, tau0 = _phase(data, tau0, data_type)
+    n = len(x)
+    ms = tauGrid(n, taus, n - 1)
+    devs = np.empty(len(ms))
+    terms = np.empty(len(ms), dtype=np.int64)
+    # Level 0 of the sparse table
+    hi = x
+    lo = x
+    span = 1
+    for i, m in enumerate(ms):
+        w = m + 1
+        while 2 * span <= w:
+            hi = np.maximum(hi[:-span], hi[span:])
+            lo = np.minimum(lo[:-span], lo[span:])
+            span *= 2
+        k = n - w + 1
+        off = w - span
+        if off:
+            peak = np.maximum(hi[:k], hi[off:off + k])
+            peak -= np.minimum(lo[:k], lo[off:off + k])
+        else:
+            peak = hi[:k] - lo[:k]
+        terms[i] = k
+        devs[i] = np.max(peak)
+    return Stability(ms * tau0, devs, terms)
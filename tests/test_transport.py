@@ -0,0 +1,166 @@
+#!   /usr/bin/env   python3
+# -*- coding: utf-8 -*
+'''
+Tests of the transports against local stand-ins of an instrument.
+
+The stand-ins answer a few SCPI queries line by line, so the framing, the
+pipelining and the timeouts of each transport are checked without the
+hardware:
+ - Gen_socket : a TCP server on the loopback interface
+ - Gen_serial : a pseudo terminal (pty)
+
+@file
+@date Created on Oct. 17, 2026
+@author Felipe Torres (torresfelipex1<AT>gmail.com)
+@copyright LGPL v2.1
+'''
+
+import os
+import pty
+import time
+import socket
+import struct
+import asyncio
+import threading
+
+import pytest
+
+from driver.gen_socket import Gen_socket
+from driver.gen_serial import Gen_serial
+
+IDN = b"Keysight,53230A,MY1,1"
+
+class StandIn() :
+    '''
+    Answers of the stand-ins: *IDN?, READ? (1, 2, 3...), BLK? (a binary
+    block with terminator bytes inside) and nothing for the other messages.
+    '''
+
+    def __init__(self) :
+        ## Messages received, in order
+        self.log = []
+        self._value = 0
+
+    def answer(self, line) :
+        cmd = line.decode().strip()
+        self.log.append(cmd)
+        if cmd == "*IDN?" :
+            return IDN + b"\n"
+        if cmd == "READ?" :
+            self._value += 1
+            return b"%+.6E\n" % self._value
+        if cmd == "BLK?" :
+            data = struct.pack("<2d", 10.0, 10.0)
+            return b"#216" + data + b"\n"
+        return None
+
+    def wait(self, count, timeout=2) :
+        '''
+        Wait until count messages were received
+        '''
+        deadline = time.monotonic() + timeout
+        while len(self.log) < count and time.monotonic() < deadline :
+            time.sleep(0.01)
+        return len(self.log) >= count
+
+@pytest.fixture
+def tcp() :
+    '''
+    A raw SCPI socket stand-in, yields (Gen_socket, StandIn)
+    '''
+    dev = StandIn()
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(1)
+
+    def serve() :
+        conn, _ = srv.accept()
+        with conn, conn.makefile("rb") as f :
+            for line in f :
+                ans = dev.answer(line)
+                if ans is not None :
+                    conn.sendall(ans)
+
+    threading.Thread(target=serve, daemon=True).start()
+    inst = Gen_socket("127.0.0.1:%d" % srv.getsockname()[1], timeout=1)
+    yield inst, dev
+    inst.close()
+    srv.close()
+
+@pytest.fixture
+def tty() :
+    '''
+    A serial port stand-in on a pty, yields (Gen_serial, StandIn)
+    '''
+    dev = StandIn()
+    master, slave = pty.openpty()
+
+    def serve() :
+        buf = b""
+        while True :
+            try :
+                data = os.read(master, 4096)
+            except OSError :
+                return
+            buf += data
+            while b"\n" in buf :
+                line, buf = buf.split(b"\n", 1)
+                ans = dev.answer(line)
+                if ans is not None :
+                    os.write(master, ans)
+
+    threading.Thread(target=serve, daemon=True).start()
+    inst = Gen_serial(os.ttyname(slave), timeout=1)
+    yield inst, dev
+    inst.close()
+    os.close(slave)
+    os.close(master)
+
+def test_socket_query(tcp) :
+    inst, dev = tcp
+    assert inst.query("*IDN?") == IDN.decode()
+    assert struct.unpack("<2d", bytes(inst.queryRaw("BLK?"))[4:-1]) == (10.0, 10.0)
+
+def test_socket_pipeline(tcp) :
+    inst, dev = tcp
+    for _ in range(3) :
+        inst.post("READ?")
+    # The three queries reach the device before any answer is read
+    assert dev.wait(3)
+    assert inst.pending == 3
+    assert [float(bytes(inst.fetch())) for _ in range(3)] == [1.0, 2.0, 3.0]
+    assert inst.queryMany(["READ?"] * 20) == ["%+.6E" % v for v in range(4, 24)]
+
+def test_socket_async(tcp) :
+    inst, dev = tcp
+    assert asyncio.run(inst.queryAsync("*IDN?")) == IDN.decode()
+
+def test_socket_timeout(tcp) :
+    inst, dev = tcp
+    inst.setTimeout(0.2)
+    with pytest.raises(TimeoutError) :
+        inst.query("NOANSWER?")
+    with pytest.raises(TimeoutError) :
+        asyncio.run(inst.queryAsync("NOANSWER?"))
+
+def test_serial_query(tty) :
+    inst, dev = tty
+    assert inst.query("*IDN?") == IDN.decode()
+    assert struct.unpack("<2d", bytes(inst.queryRaw("BLK?"))[4:-1]) == (10.0, 10.0)
+    assert asyncio.run(inst.queryAsync("READ?")) == "%+.6E" % 1
+
+def test_serial_framing(tty) :
+    inst, dev = tty
+    # Messages written back to back arrive as separate lines
+    inst.write("INIT")
+    inst.write("*OPC")
+    assert inst.query("*IDN?") == IDN.decode()
+    assert dev.log == ["INIT", "*OPC", "*IDN?"]
+
+def test_serial_timeout(tty) :
+    inst, dev = tty
+    inst.setTimeout(0.2)
+    with pytest.raises(TimeoutError) :
+        inst.query("NOANSWER?")
+    with pytest.raises(TimeoutError) :
+        asyncio.run(inst.queryAsync("NOANSWER?"))
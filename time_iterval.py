@@ -28,18 +28,12 @@ A Python tool to measure Time Interval
 #-------------------------------------------------------------------------------
 import datetime
 import time
-import threading as th
 import argparse as arg
 
 from driver.gencounter import *
 from driver.fca3103 import FCA3103
 from misc.measured_data import MeasuredData
 
-def guardaPorSi(datos, fichero):
-    datos.flushToFile(fichero)
-    # Me echo una siesta...
-    time.sleep(10)
-
 def main():
     '''
     A quick tool to measure time interval with the Tektronix FCA3103
@@ -49,21 +43,30 @@ def main():
     # El 2 es la X en /dev/usbtmcX
     device = FCA3103(Interfaces.usb, 2, "Mi querido counter")
     datos = MeasuredData()
-    device.resetDevice()
-    # Todavía no está eso implementado en la API, así que a pelo
-    device._drv.write("INPUT1:COUPLING DC")
-    device._drv.write("INPUT2:COUPLING DC")
-    device._drv.write("INPUT2:IMPedance MAX") # 1MOhm
-    device._drv.write("INPUT1:IMPedance MAX")
-    device.trigLevel("trig1:1.5 trig2:1.5")
+    trig_cfg = "trig1:1.5 trig2:1.5"
+
+    def configure():
+        # Todavía no está eso implementado en la API, así que a pelo
+        device._drv.write("INPUT1:COUPLING DC")
+        device._drv.write("INPUT2:COUPLING DC")
+        device._drv.write("INPUT2:IMPedance MAX") # 1MOhm
+        device._drv.write("INPUT1:IMPedance MAX")
+        device.trigLevel(trig_cfg)
+
+    # Si la configuración guardada sigue valiendo, se recupera en vez de
+    # resetear y configurar todo otra vez (cambiar la key si se cambia configure)
+    device.warmStart("fca3103_setup.json", configure, key=["v1", trig_cfg])
+    device.trig_rawcfg = trig_cfg
     # El -1 es modo infinito
     cfg_str = "ref:A sampl:-1 tstamp:Y"
-    t_meas = th.Thread(target=device.timeInterval, args=(cfg_str, datos))
-    t_data = th.Thread(target=guardaPorSi, args=(datos, "salida.dat"))
 
-    t_meas.start()
-    time.sleep(20) # no hay que ser ansias
-    t_data.start()
+    # Las medidas se van guardando en el fichero mientras se mide. Se para
+    # con Ctrl+C y se guarda lo que quede en el buffer
+    datos.startFlusher("salida.dat")
+    try:
+        device.timeInterval(cfg_str, datos)
+    finally:
+        datos.stopFlusher()
 
 if __name__ == "__main__" :
     main()